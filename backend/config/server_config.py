@@ -7,6 +7,8 @@ from fastapi.templating import Jinja2Templates
 from backend.core.MongoDbClient import MongoDbClient
 from backend.middleware.auth_middleware import AuthMiddleware
 from backend.config.logging_config import setup_logging
+from backend.utils.llm_cache import attach_mongo_tier
+from backend.utils.llm_utils import llm_cache
 
 logger = setup_logging()
 
@@ -75,6 +77,7 @@ class ServerConfig:
         mongo_client = MongoDbClient.get_instance("ai-toolkit")
         self.app.state.db = mongo_client.db
         self.app.state.templates = Jinja2Templates(directory="templates")
+        attach_mongo_tier(llm_cache, mongo_client.db)
 
     def configure(self):
         self.app.add_middleware(AuthMiddleware)
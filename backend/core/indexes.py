@@ -0,0 +1,144 @@
+"""
+Declarative MongoDB index registry, applied at startup, plus a query plan check:
+
+    python -m backend.core.indexes --apply      # create missing indexes
+    python -m backend.core.indexes --explain    # flag hot queries that scan a whole collection
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger('app.indexes')
+
+# MongoDB error codes for an index that exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        # Same default name MongoDB derives, so indexes created before the registry are matched
+        return '_'.join(f"{key}_{direction}" for key, direction in self.keys)
+
+INDEXES: List[IndexSpec] = [
+    IndexSpec('users', (('username', 1),), {'unique': True}),
+    IndexSpec('thumbnails', (('user_id', 1), ('created_at', -1), ('_id', -1))),
+    IndexSpec('generated_images', (('category', 1),)),
+    IndexSpec('generated_images', (('prompt_hash', 1), ('model', 1), ('created_at', -1))),
+    IndexSpec('page_build_jobs', (('status', 1), ('created_at', 1))),
+    IndexSpec('page_build_events', (('job_id', 1), ('seq', 1)), {'unique': True}),
+    IndexSpec('page_build_events', (('created_at', 1),), {'expireAfterSeconds': 86400}),
+    IndexSpec('api_usage', (('expires_at', 1),), {'expireAfterSeconds': 0}),
+    IndexSpec('llm_cache', (('expires_at', 1),), {'expireAfterSeconds': 0}),
+    IndexSpec('llm_cache', (('created_at', 1),)),
+]
+
+async def apply_indexes(db, indexes: List[IndexSpec] = INDEXES) -> None:
+    """Create every registered index; existing ones are left alone and TTL changes are applied in place."""
+    for spec in indexes:
+        collection = db.get_collection(spec.collection)
+        try:
+            await collection.create_index(list(spec.keys), **spec.options)
+        except OperationFailure as e:
+            if e.code in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT) and 'expireAfterSeconds' in spec.options:
+                await db.command(
+                    'collMod',
+                    spec.collection,
+                    index={'name': spec.name, 'expireAfterSeconds': spec.options['expireAfterSeconds']},
+                )
+                logger.info(f"Updated TTL of index {spec.collection}.{spec.name}")
+            else:
+                # Typically duplicate usernames blocking the unique index; the app still works without it
+                logger.error(f"Could not create index {spec.collection}.{spec.name}: {str(e)}")
+    logger.info(f"Ensured {len(indexes)} MongoDB indexes")
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: List[Tuple[str, int]] = field(default_factory=list)
+
+def hot_queries() -> List[HotQuery]:
+    """Representative shapes of the queries on request paths, with placeholder values."""
+    some_id = ObjectId()
+    now = datetime.now(timezone.utc)
+    return [
+        HotQuery('get_user', 'users', {'username': 'explain'}),
+        HotQuery('list_thumbnails', 'thumbnails', {'user_id': str(some_id)}, [('created_at', -1), ('_id', -1)]),
+        HotQuery('delete_thumbnail', 'thumbnails', {'_id': some_id, 'user_id': str(some_id)}),
+        HotQuery(
+            'find_cached_image',
+            'generated_images',
+            {'prompt_hash': 'explain', 'model': 'explain', 'sha256': {'$exists': True}},
+            [('created_at', -1)],
+        ),
+        HotQuery('images_by_category', 'generated_images', {'category': 'explain'}),
+        HotQuery(
+            'claim_job',
+            'page_build_jobs',
+            {'$or': [{'status': 'queued'}, {'status': 'running', 'heartbeat_at': {'$lt': now}}]},
+            [('created_at', 1)],
+        ),
+        HotQuery('stream_events', 'page_build_events', {'job_id': some_id, 'seq': {'$gt': 0}}, [('seq', 1)]),
+    ]
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get('stage', '')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def explain_hot_queries(db) -> List[Dict[str, Any]]:
+    """Run explain() on each hot query and report whether its winning plan scans the collection."""
+    report = []
+    for query in hot_queries():
+        cursor = db.get_collection(query.collection).find(query.filter).limit(1)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation['queryPlanner']['winningPlan'])
+        report.append({
+            'query': query.name,
+            'collection': query.collection,
+            'stages': stages,
+            'collection_scan': 'COLLSCAN' in stages,
+            'in_memory_sort': 'SORT' in stages,
+        })
+    return report
+
+async def _main(args) -> int:
+    from backend.core.MongoDbClient import MongoDbClient
+
+    db = MongoDbClient.get_instance('ai-toolkit').db
+    if args.apply:
+        await apply_indexes(db)
+    if not args.explain:
+        return 0
+
+    report = await explain_hot_queries(db)
+    for row in report:
+        flag = 'COLLSCAN' if row['collection_scan'] else ('SORT' if row['in_memory_sort'] else 'ok')
+        print(f"{flag:9} {row['collection']}.{row['query']}: {' <- '.join(row['stages'])}")
+    return 1 if any(row['collection_scan'] for row in report) else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apply', action='store_true', help='create missing indexes')
+    parser.add_argument('--explain', action='store_true', help='explain hot queries and exit 1 on a collection scan')
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(parser.parse_args())))
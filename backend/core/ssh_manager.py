@@ -1,15 +1,104 @@
 import os
+import posixpath
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 import paramiko
 
+class PooledSFTPConnection:
+    def __init__(self, ssh_client, sftp):
+        self.ssh_client = ssh_client
+        self.sftp = sftp
+        self.last_used = time.monotonic()
+
+    def is_healthy(self, idle_timeout):
+        transport = self.ssh_client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        return time.monotonic() - self.last_used < idle_timeout
+
+    def close(self):
+        try:
+            self.sftp.close()
+        finally:
+            self.ssh_client.close()
+
+class SSHConnectionPool:
+    """Bounded, thread-safe pool of SSH connections with an open SFTP channel each."""
+
+    def __init__(self, connect, logger, max_size=4, keepalive_interval=30, idle_timeout=300):
+        self._connect = connect
+        self.logger = logger
+        self.max_size = max_size
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _open(self):
+        ssh_client = self._connect()
+        if ssh_client is None:
+            return None
+        transport = ssh_client.get_transport()
+        if transport is not None:
+            transport.set_keepalive(self.keepalive_interval)
+        return PooledSFTPConnection(ssh_client, ssh_client.open_sftp())
+
+    def _take_idle(self):
+        with self._lock:
+            while self._idle:
+                connection = self._idle.pop()
+                if connection.is_healthy(self.idle_timeout):
+                    return connection
+                connection.close()
+        return None
+
+    @contextmanager
+    def checkout(self):
+        self._slots.acquire()
+        connection = None
+        try:
+            connection = self._take_idle() or self._open()
+            if connection is None:
+                yield None
+                return
+            yield connection.sftp
+        except Exception:
+            # Never return a connection that failed mid-operation
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                connection.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(connection)
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
 class SSHManager:
-    def __init__(self, is_dev_mode, logger):
+    def __init__(self, is_dev_mode, logger, pool_size=None):
         self.is_dev_mode = is_dev_mode
         self.logger = logger
         self.dev_server_ip = 'myserver.local'
+        self.pool = SSHConnectionPool(
+            self._get_ssh_client,
+            logger,
+            max_size=pool_size or int(os.getenv('SSH_POOL_SIZE', '4')),
+        )
+        self._known_dirs = set()
+        self._known_dirs_lock = threading.Lock()
 
     def _get_ssh_client(self):
+        ssh = paramiko.SSHClient()
         try:
-            ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh_key_path = os.path.expanduser('~/.ssh/abyssus')
             ssh.connect(
@@ -26,4 +115,61 @@ class SSHManager:
     def get_client(self):
         if self.is_dev_mode:
             return self._get_ssh_client()
-        return None
\ No newline at end of file
+        return None
+
+    @contextmanager
+    def sftp_session(self):
+        """Check out a pooled SFTP client; yields None outside dev mode or when the server is unreachable."""
+        if not self.is_dev_mode:
+            yield None
+            return
+        with self.pool.checkout() as sftp:
+            yield sftp
+
+    def ensure_remote_dir(self, sftp, remote_path):
+        """Create remote_path and any missing parents, remembering directories known to exist."""
+        with self._known_dirs_lock:
+            if remote_path in self._known_dirs:
+                return
+        try:
+            sftp.stat(remote_path)
+        except FileNotFoundError:
+            parent = posixpath.dirname(remote_path)
+            if parent and parent != remote_path:
+                self.ensure_remote_dir(sftp, parent)
+            try:
+                sftp.mkdir(remote_path)
+            except IOError:
+                # Another upload created it first
+                sftp.stat(remote_path)
+        with self._known_dirs_lock:
+            self._known_dirs.add(remote_path)
+
+    @contextmanager
+    def remote_writer(self, sftp, remote_path):
+        """Pipelined remote file written under a temporary name and renamed into place on success."""
+        self.ensure_remote_dir(sftp, posixpath.dirname(remote_path))
+        tmp_path = f"{remote_path}.part"
+        try:
+            with sftp.open(tmp_path, 'wb') as remote_file:
+                remote_file.set_pipelined(True)
+                yield remote_file
+            sftp.posix_rename(tmp_path, remote_path)
+        except Exception:
+            try:
+                sftp.remove(tmp_path)
+            except IOError:
+                pass
+            raise
+
+    def upload_fileobj(self, sftp, fileobj, remote_path, chunk_size=32768):
+        """Pipelined upload that skips the post-transfer stat round-trip."""
+        with self.remote_writer(sftp, remote_path) as remote_file:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                remote_file.write(chunk)
+
+    def close(self):
+        self.pool.close()
@@ -3,9 +3,17 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI 
 from backend.config.logging_config import setup_logging
 from backend.config.server_config import ServerConfig, run_server
+from backend.core.indexes import apply_indexes
+from backend.middleware.Oauth2 import password_executor
 from backend.routes.site_routes import site_router
 from backend.routes.auth_routes import auth_routes
 from backend.routes.page_builder_routes import page_builder_router
+from backend.routes.metrics_routes import metrics_router
+from backend.services.image_gen.image_scheduler import image_scheduler
+from backend.services.jobs.page_build_jobs import PageBuildJobQueue
+from backend.services.page_builder.page_builder import ssh_manager
+from backend.services.thumbnails.html_store import ThumbnailHtmlStore
+from backend.utils.llm_utils import llm_executor
 
 logger = setup_logging()
 
@@ -13,7 +21,16 @@ logger = setup_logging()
 async def lifespan(application: FastAPI):
     logger.info("Starting up the application...")
     logger.info(f"Environment: {'Development' if os.getenv('IS_LOCAL_DEV') == 'true' else 'Production'}")
+    await apply_indexes(application.state.db)
+    application.state.job_queue = PageBuildJobQueue(application.state.db)
+    await application.state.job_queue.start()
+    application.state.thumbnail_html = ThumbnailHtmlStore(application.state.db)
     yield
+    await application.state.job_queue.stop()
+    llm_executor.shutdown(wait=False, cancel_futures=True)
+    password_executor.shutdown(wait=False, cancel_futures=True)
+    image_scheduler.shutdown()
+    ssh_manager.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -25,6 +42,7 @@ server_config.configure()
 app.include_router(site_router)
 app.include_router(auth_routes)
 app.include_router(page_builder_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     run_server(app)
\ No newline at end of file
@@ -1,6 +1,10 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import os
+import threading
+import time
 from typing import Annotated
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
@@ -9,6 +13,7 @@ from passlib.context import CryptContext
 from pydantic import BaseModel
 from backend.config.logging_config import setup_logging
 from backend.models.UserModel import User
+from backend.utils.user_cache import user_cache
 
 logger = setup_logging()
 
@@ -30,34 +35,124 @@ class TokenPair(BaseModel):
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 
+# Work factor for new hashes; stored hashes with a different cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
 # Security utilities
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+# auto_error is off so requests authenticated by AuthMiddleware need no Authorization header
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+_password_pool_lock = threading.Lock()
+_password_pool_stats = {'active': 0, 'queued': 0, 'completed': 0, 'rejected': 0, 'peak_queued': 0, 'total_wait_seconds': 0.0}
+
+def get_password_pool_stats() -> dict:
+    """Snapshot of the password hashing pool for the metrics endpoint."""
+    with _password_pool_lock:
+        stats = dict(_password_pool_stats)
+    stats['max_workers'] = PASSWORD_HASH_WORKERS
+    stats['bcrypt_rounds'] = BCRYPT_ROUNDS
+    return stats
+
+def _run_password_task(ticket, submitted_at, func, *args):
+    queue_wait = time.monotonic() - submitted_at
+    with _password_pool_lock:
+        if ticket['state'] == 'abandoned':
+            # The request went away while this job waited; its queue slot is already released
+            return None
+        ticket['state'] = 'running'
+        _password_pool_stats['queued'] -= 1
+        _password_pool_stats['active'] += 1
+        _password_pool_stats['total_wait_seconds'] += queue_wait
+    try:
+        return func(*args)
+    finally:
+        with _password_pool_lock:
+            _password_pool_stats['active'] -= 1
+            _password_pool_stats['completed'] += 1
+
+async def _run_in_password_pool(func, *args):
+    with _password_pool_lock:
+        if _password_pool_stats['queued'] >= PASSWORD_HASH_MAX_QUEUE:
+            _password_pool_stats['rejected'] += 1
+            queue_full = True
+        else:
+            _password_pool_stats['queued'] += 1
+            _password_pool_stats['peak_queued'] = max(_password_pool_stats['peak_queued'], _password_pool_stats['queued'])
+            queue_full = False
+    if queue_full:
+        logger.warning(f"Password hashing queue full ({PASSWORD_HASH_MAX_QUEUE} waiting), rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    ticket = {'state': 'queued'}
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(password_executor, _run_password_task, ticket, time.monotonic(), func, *args)
+    finally:
+        # A cancelled request never reaches the worker, so release its queue slot here
+        with _password_pool_lock:
+            if ticket['state'] == 'queued':
+                ticket['state'] = 'abandoned'
+                _password_pool_stats['queued'] -= 1
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+    return await _run_in_password_pool(pwd_context.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await _run_in_password_pool(pwd_context.hash, password)
 
 async def get_user(db, username: str) -> User | None:
+    found, user_dict = user_cache.get(username)
+    if found:
+        return User(**user_dict) if user_dict else None
     try:
         user_dict = await db.users.find_one({"username": username})
         if user_dict:
             user_dict["user_id"] = str(user_dict["_id"])
             user_dict.pop("_id")
+            user_cache.set(username, user_dict)
             return User(**user_dict)
+        user_cache.set(username, None)
         return None
     except Exception as e:
         logger.error(f"Error getting user: {str(e)}", exc_info=True)
         return None
 
+def invalidate_user(username: str) -> None:
+    """Drop a cached user; call after any write to that user's document."""
+    user_cache.invalidate(username)
+
 async def authenticate_user(db, username: str, password: str):
     try:
         user = await get_user(db, username)
-        if not user or not verify_password(password, user.hashed_password):
+        if not user:
             return False
+        valid, new_hash = await verify_password(password, user.hashed_password)
+        if not valid:
+            return False
+        if new_hash:
+            # Work factor changed since this hash was stored
+            await db.users.update_one({"username": username}, {"$set": {"hashed_password": new_hash}})
+            invalidate_user(username)
+            user.hashed_password = new_hash
+            logger.info(f"Upgraded password hash for {username}")
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         return False
@@ -78,8 +173,12 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
             detail="Could not create token"
         )
 
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its claims; raises jwt.exceptions.InvalidTokenError."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
 async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
+    token: Annotated[str | None, Depends(oauth2_scheme)],
     request: Request
 ) -> dict:
     credentials_exception = HTTPException(
@@ -87,14 +186,20 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    # Claims verified by AuthMiddleware, falling back to the Authorization header
+    payload = getattr(request.state, "auth_claims", None)
+    if payload is None:
+        if not token:
+            raise credentials_exception
+        try:
+            payload = decode_access_token(token)
+        except jwt.exceptions.InvalidTokenError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except jwt.exceptions.InvalidTokenError:
+
+    username: str = payload.get("sub")
+    if username is None:
         raise credentials_exception
+    token_data = TokenData(username=username)
 
     db = request.app.state.db
     user = await get_user(db, token_data.username)
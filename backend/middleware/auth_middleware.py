@@ -1,101 +1,128 @@
-from fastapi import status, HTTPException
-from fastapi.requests import Request
-from fastapi.responses import RedirectResponse, JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from backend.middleware.Oauth2 import refresh_access_token
+import hashlib
+import os
+import time
+import jwt
+from fastapi import status
+from fastapi.responses import RedirectResponse, JSONResponse, Response
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
+from backend.middleware.Oauth2 import decode_access_token, refresh_access_token
 from backend.config.logging_config import setup_logging
 
 logger = setup_logging()
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.public_paths = [
-            '/auth/login', 
-            '/auth/register', 
-            '/auth/token', 
-            '/static/', 
-            '/favicon.ico', 
-            '/auth/refresh'
-        ]
+PUBLIC_PATHS = (
+    '/auth/login',
+    '/auth/register',
+    '/auth/token',
+    '/static/',
+    '/favicon.ico',
+    '/auth/refresh',
+    '/metrics',
+)
 
-    async def dispatch(self, request: Request, call_next):
-        if self._is_public_path(request):
-            return await call_next(request)
+# Concurrent requests carrying the same refresh cookie within this window share one new access token
+REFRESH_GRACE_SECONDS = float(os.getenv("REFRESH_GRACE_SECONDS", "30"))
+REFRESH_GRACE_MAX_ENTRIES = 10000
 
-        access_token = request.cookies.get('access_token')
-        refresh_token = request.cookies.get('refresh_token')
+class AuthMiddleware:
+    """
+    Raw ASGI auth middleware. The access token cookie is verified once here and its claims are
+    stored in scope["state"]["auth_claims"] for get_current_user; responses pass through untouched.
+    An expired access token is refreshed in-band: the request proceeds and its response carries
+    the new access cookie.
+    """
 
-        if not self._is_valid_access_token(access_token):
-            return await self._handle_invalid_access_token(request, refresh_token)
+    def __init__(self, app: ASGIApp, public_paths: tuple = PUBLIC_PATHS):
+        self.app = app
+        # str.startswith with a tuple checks every prefix in one C call
+        self.public_prefixes = tuple(public_paths)
+        # sha256(refresh token) -> (access token, claims, issued_at)
+        self._recent_refreshes = {}
 
-        return await self._process_request(request, call_next, refresh_token)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['path'].startswith(self.public_prefixes):
+            await self.app(scope, receive, send)
+            return
 
-    def _is_public_path(self, request: Request) -> bool:
-        return any(request.url.path.startswith(path) for path in self.public_paths)
+        headers = self._headers(scope)
+        cookies = cookie_parser(headers.get('cookie', ''))
+        access_token = cookies.get('access_token')
+        refresh_token = cookies.get('refresh_token')
+        is_html = headers.get('accept', '').startswith('text/html')
 
-    def _is_valid_access_token(self, access_token: str) -> bool:
-        return access_token and access_token.startswith('Bearer ')
+        claims = None
+        if self._is_valid_access_token(access_token):
+            try:
+                claims = decode_access_token(access_token.removeprefix('Bearer '))
+            except jwt.exceptions.InvalidTokenError:
+                claims = None
 
-    def _is_html_request(self, request: Request) -> bool:
-        return request.headers.get('accept', '').startswith('text/html')
+        if claims is None:
+            refreshed = self._refresh(refresh_token) if refresh_token else None
+            if refreshed is None:
+                response = self._unauthenticated_response(is_html)
+                await response(scope, receive, send)
+                return
+            new_token, claims = refreshed
+            send = self._send_with_cookie(send, new_token)
 
-    def _create_token_response(self, request: Request, new_token: str) -> RedirectResponse:
-        response = RedirectResponse(
-            url=request.url.path,
-            status_code=status.HTTP_302_FOUND
-        )
-        response.set_cookie(
+        scope.setdefault('state', {})['auth_claims'] = claims
+        await self.app(scope, receive, send)
+
+    def _refresh(self, refresh_token: str):
+        """Return (access token, claims) for a valid refresh token, reusing one minted within the grace window."""
+        key = hashlib.sha256(refresh_token.encode()).hexdigest()
+        now = time.monotonic()
+        recent = self._recent_refreshes.get(key)
+        if recent and now - recent[2] < REFRESH_GRACE_SECONDS:
+            return recent[0], recent[1]
+
+        try:
+            new_token = refresh_access_token(refresh_token)
+            claims = decode_access_token(new_token)
+        except Exception as e:
+            logger.error(f"Error refreshing token: {str(e)}")
+            return None
+
+        if len(self._recent_refreshes) >= REFRESH_GRACE_MAX_ENTRIES:
+            self._recent_refreshes = {
+                k: v for k, v in self._recent_refreshes.items() if now - v[2] < REFRESH_GRACE_SECONDS
+            }
+        self._recent_refreshes[key] = (new_token, claims, now)
+        return new_token, claims
+
+    def _send_with_cookie(self, send: Send, new_token: str) -> Send:
+        cookie_headers = self._access_cookie_headers(new_token)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + cookie_headers
+            await send(message)
+
+        return send_wrapper
+
+    def _headers(self, scope: Scope) -> dict:
+        return {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+
+    def _is_valid_access_token(self, access_token: str) -> bool:
+        return bool(access_token) and access_token.startswith('Bearer ')
+
+    def _access_cookie_headers(self, new_token: str) -> list:
+        cookie_response = Response()
+        cookie_response.set_cookie(
             key="access_token",
             value=f"Bearer {new_token}",
             httponly=True,
             secure=True,
             samesite="lax"
         )
-        return response
+        return [(key, value) for key, value in cookie_response.raw_headers if key == b'set-cookie']
 
-    async def _handle_invalid_access_token(self, request: Request, refresh_token: str):
-        if refresh_token and self._is_html_request(request):
-            try:
-                new_token = refresh_access_token(refresh_token)
-                return self._create_token_response(request, new_token)
-            except Exception:
-                return RedirectResponse(url='/auth/login')
-
-        if self._is_html_request(request):
+    def _unauthenticated_response(self, is_html: bool):
+        if is_html:
             return RedirectResponse(url='/auth/login')
-
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content={"detail": "Not authenticated"}
         )
-
-    async def _process_request(self, request: Request, call_next, refresh_token: str):
-        try:
-            # Add token to request headers
-            request.headers.__dict__["_list"].append(
-                (b'authorization', request.cookies['access_token'].encode())
-            )
-            
-            response = await call_next(request)
-            
-            if response.status_code == status.HTTP_401_UNAUTHORIZED and refresh_token:
-                return await self._handle_unauthorized_response(request, refresh_token)
-            
-            return response
-            
-        except HTTPException as e:
-            raise e
-
-    async def _handle_unauthorized_response(self, request: Request, refresh_token: str):
-        try:
-            new_token = refresh_access_token(refresh_token)
-            return self._create_token_response(request, new_token)
-        except Exception as e:
-            logger.error(f"Error refreshing token: {str(e)}")
-            if self._is_html_request(request):
-                return RedirectResponse(url='/auth/login')
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Not authenticated"}
-            )
\ No newline at end of file
@@ -6,3 +6,4 @@ class User(BaseModel):
     api_request_count: int
     disabled: bool = False
     hashed_password: str
+    plan: str | None = None
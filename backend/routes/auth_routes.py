@@ -4,7 +4,7 @@ from fastapi.responses import Response
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from backend.middleware.Oauth2 import (
-    get_password_hash, 
+    get_password_hash, invalidate_user,
     get_current_user, authenticate_user, refresh_access_token, create_token_pair
 )
 from backend.models.UserModel import User
@@ -84,7 +84,7 @@ async def register_user(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     user_data = {
         "username": user_data.username,
         "hashed_password": hashed_password,
@@ -93,6 +93,8 @@ async def register_user(
     }
     
     await db.users.insert_one(user_data)
+    # The username may be negatively cached from an earlier lookup
+    invalidate_user(user_data["username"])
 
     token_pair = create_token_pair({"sub": user_data["username"]})
     
@@ -0,0 +1,36 @@
+import hmac
+import os
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import PlainTextResponse
+from backend.middleware.Oauth2 import get_password_pool_stats
+from backend.services.image_gen.image_scheduler import image_scheduler
+from backend.utils.llm_utils import get_llm_pool_stats, llm_cache
+from backend.utils.tracing import metrics_sink
+from backend.utils.user_cache import user_cache
+
+metrics_router = APIRouter()
+
+def render_gauges(prefix: str, stats: dict) -> list:
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value:g}")
+    return lines
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint, enabled by setting METRICS_TOKEN."""
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    lines = metrics_sink.render()
+    lines.extend(render_gauges("llm_cache", llm_cache.get_stats()))
+    lines.extend(render_gauges("llm_pool", get_llm_pool_stats()))
+    lines.extend(render_gauges("password_pool", get_password_pool_stats()))
+    lines.extend(render_gauges("user_cache", user_cache.get_stats()))
+    lines.extend(render_gauges("image_scheduler", image_scheduler.get_stats()))
+    return "\n".join(lines) + "\n"
@@ -1,45 +1,128 @@
-import asyncio
+import base64
+import json
 from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
 from typing import Annotated
 from bson import ObjectId
 from datetime import datetime, timezone
 from backend.models.UserModel import User
 from backend.config.logging_config import setup_logging
-from backend.middleware.Oauth2 import get_current_user
-from backend.services.page_builder.page_builder import page_builder_pipeline
+from backend.middleware.Oauth2 import get_current_user, invalidate_user
+from backend.services.quota.rate_limits import QuotaDecision, rate_limiter
+from backend.services.thumbnails.html_store import ThumbnailHtmlStore, etag_for, etag_matches, html_sha256
 logger = setup_logging()
 
 class WebsiteDescription(BaseModel):
     website_description: str
-
-MAX_API_REQUESTS = 10
+    protocol_version: int = 1
 
 page_builder_router = APIRouter()
 
 def get_db(request: Request):
     return request.app.state.db
 
+THUMBNAIL_PAGE_SIZE = 20
+MAX_THUMBNAIL_PAGE_SIZE = 100
+
+def encode_thumbnail_cursor(thumbnail: dict) -> str:
+    raw = f"{thumbnail['created_at'].isoformat()}|{thumbnail['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_thumbnail_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        created_at, thumbnail_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(thumbnail_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def get_html_store(request: Request) -> ThumbnailHtmlStore:
+    return request.app.state.thumbnail_html
+
 @page_builder_router.get("/thumbnails")
-async def get_thumbnails(user: User = Depends(get_current_user), db = Depends(get_db)):
-    thumbnails = await db.thumbnails.find({"user_id": user.user_id}).to_list(length=None)
-    return [{**t, "_id": str(t["_id"])} for t in thumbnails]
+async def get_thumbnails(
+    user: User = Depends(get_current_user),
+    db = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = THUMBNAIL_PAGE_SIZE,
+):
+    """Newest first, without HTML bodies; pass next_cursor back to get the following page."""
+    limit = max(1, min(limit, MAX_THUMBNAIL_PAGE_SIZE))
+    query = {"user_id": user.user_id}
+    if cursor:
+        created_at, thumbnail_id = decode_thumbnail_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": thumbnail_id}},
+        ]
+
+    thumbnails = await db.thumbnails.find(query, {"html": 0}) \
+        .sort([("created_at", -1), ("_id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(length=limit + 1)
+    next_cursor = encode_thumbnail_cursor(thumbnails[limit - 1]) if len(thumbnails) > limit else None
+    return {
+        "items": [{**t, "_id": str(t["_id"])} for t in thumbnails[:limit]],
+        "next_cursor": next_cursor,
+    }
+
+@page_builder_router.get("/thumbnails/{thumbnail_id}/html")
+async def get_thumbnail_html(
+    request: Request,
+    thumbnail_id: str,
+    user: User = Depends(get_current_user),
+    db = Depends(get_db),
+    html_store: ThumbnailHtmlStore = Depends(get_html_store)
+):
+    if not ObjectId.is_valid(thumbnail_id):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    thumbnail = await db.thumbnails.find_one(
+        {"_id": ObjectId(thumbnail_id), "user_id": user.user_id},
+        {"html": 1, "html_sha256": 1}
+    )
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    # Pages saved before blob storage keep their HTML inline
+    sha256 = thumbnail.get("html_sha256") or html_sha256(thumbnail.get("html", ""))
+    headers = {"ETag": etag_for(sha256), "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if "html_sha256" not in thumbnail:
+        body = thumbnail.get("html", "").encode()
+    elif "gzip" in request.headers.get("accept-encoding", ""):
+        body = await html_store.get_gzip(sha256)
+        headers["Content-Encoding"] = "gzip"
+    else:
+        html = await html_store.get_html(sha256)
+        body = html.encode() if html is not None else None
+    if body is None:
+        logger.error(f"Missing HTML blob {sha256} for thumbnail {thumbnail_id}")
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
 
 @page_builder_router.post("/thumbnails")
 async def save_thumbnail(
     thumbnail_data: dict,
     user: User = Depends(get_current_user),
-    db = Depends(get_db)
+    db = Depends(get_db),
+    html_store: ThumbnailHtmlStore = Depends(get_html_store)
 ):
+    sha256 = await html_store.put(thumbnail_data["html"])
     new_thumbnail = {
         "_id": ObjectId(thumbnail_data["id"]),
         "title": thumbnail_data["title"],
-        "html": thumbnail_data["html"],
+        "html_sha256": sha256,
         "user_id": user.user_id,
         "created_at": datetime.now(timezone.utc)
     }
-    await db.thumbnails.insert_one(new_thumbnail)
+    try:
+        await db.thumbnails.insert_one(new_thumbnail)
+    except Exception:
+        await html_store.release(sha256)
+        raise
     new_thumbnail["_id"] = str(new_thumbnail["_id"])
     return new_thumbnail
 
@@ -47,75 +130,147 @@ async def save_thumbnail(
 async def delete_thumbnail(
     thumbnail_id: str,
     user: User = Depends(get_current_user),
-    db = Depends(get_db)
+    db = Depends(get_db),
+    html_store: ThumbnailHtmlStore = Depends(get_html_store)
 ):
-    result = await db.thumbnails.delete_one({
-        "_id": ObjectId(thumbnail_id),
-        "user_id": user.user_id
-    })
+    deleted = await db.thumbnails.find_one_and_delete(
+        {"_id": ObjectId(thumbnail_id), "user_id": user.user_id},
+        projection={"html_sha256": 1}
+    )
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Thumbnail not found")
+    if deleted.get("html_sha256"):
+        await html_store.release(deleted["html_sha256"])
     
     return {"message": "Thumbnail deleted"}
 
-@page_builder_router.post("/page_builder")
-async def start_pipeline(
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+async def charge_api_request(db, current_user: User) -> tuple[QuotaDecision, JSONResponse | None]:
+    """Count a build against the user's plan limits, or return the 429 response when one is used up."""
+    decision = await rate_limiter.acquire(db, current_user)
+    if not decision.allowed:
+        headers = {"Retry-After": str(int(decision.retry_after) + 1)} if decision.retry_after else None
+        return decision, JSONResponse(
+            status_code=429,
+            content={
+                "message": decision.message,
+                "remaining_requests": 0,
+                "max_requests": decision.limit
+            },
+            headers=headers
+        )
+    invalidate_user(current_user.username)
+    return decision, None
+
+def stream_job_events(
     request: Request,
-    description: WebsiteDescription,
-    current_user: Annotated[User, Depends(get_current_user)]
+    job_id: str,
+    last_event_id: int = 0,
+    announce: bool = False,
+    remaining_requests: int | None = None,
 ):
+    job_queue = request.app.state.job_queue
+
+    async def generate():
+        if announce:
+            yield f'data: {json.dumps({"type": "job", "job_id": job_id})}\n\n'
+            if remaining_requests is not None:
+                yield f'data: {json.dumps({"type": "info", "remaining_requests": remaining_requests})}\n\n'
+        try:
+            async for seq, data in job_queue.stream_events(job_id, last_event_id):
+                yield f"id: {seq}\ndata: {data}\n\n"
+        except Exception as e:
+            yield f'data: {json.dumps({"type": "error", "message": f"Pipeline error: {str(e)}"})}\n\n'
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def submit_build(request: Request, description: WebsiteDescription, current_user: User):
+    """Returns (job_id, quota decision), or (None, error response) when the build is rejected."""
     db = request.app.state.db
     
     # Validate input
     if not description.website_description.strip():
-        return JSONResponse(
+        return None, JSONResponse(
             status_code=400,
             content={"message": "Please provide a website description"}
         )
 
-    # Check API request limit
-    user_stats = await db.users.find_one({"_id": ObjectId(current_user.user_id)})
-    current_count = user_stats["api_request_count"] if user_stats else 0
-    
-    if current_count >= MAX_API_REQUESTS:
-        return JSONResponse(
-            status_code=429,
-            content={
-                "message": "You have reached your API request limit",
-                "remaining_requests": 0,
-                "max_requests": MAX_API_REQUESTS
-            }
+    decision, quota_response = await charge_api_request(db, current_user)
+    if quota_response:
+        return None, quota_response
+
+    try:
+        job_id = await request.app.state.job_queue.submit(
+            current_user.user_id,
+            description.website_description,
+            description.protocol_version,
+            quota_receipt=decision.receipt,
         )
-    
-    # Increment the request count
-    await db.users.update_one(
-        {"_id": ObjectId(current_user.user_id)},
-        {
-            "$inc": {"api_request_count": 1},
-            "$setOnInsert": {"created_at": datetime.now(timezone.utc)}
-        },
-        upsert=True
-    )
+    except Exception:
+        await rate_limiter.refund(db, current_user.user_id, decision.receipt)
+        raise
+    return job_id, decision
 
-    async def generate():
-        try:
-            # Process the actual page building
-            async for html_update in page_builder_pipeline(description.website_description, db):
-                if not html_update.startswith('data: '):
-                    html_update = f'data: {html_update}'
-                yield f"{html_update}\n\n"
-                # Add a small delay to prevent buffering issues
-                await asyncio.sleep(0.1)
-        except Exception as e:
-            yield f'data: {{"type": "error", "message": "Pipeline error: {str(e)}"}}\n\n'
-
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
\ No newline at end of file
+@page_builder_router.post("/page_builder")
+async def start_pipeline(
+    request: Request,
+    description: WebsiteDescription,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """Queue a build and stream its events; the job keeps running if the connection drops."""
+    job_id, result = await submit_build(request, description, current_user)
+    if job_id is None:
+        return result
+    return stream_job_events(request, job_id, announce=True, remaining_requests=result.remaining)
+
+@page_builder_router.post("/page_builder/jobs")
+async def create_build_job(
+    request: Request,
+    description: WebsiteDescription,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    job_id, result = await submit_build(request, description, current_user)
+    if job_id is None:
+        return result
+    return {"job_id": job_id, "remaining_requests": result.remaining}
+
+@page_builder_router.get("/page_builder/jobs/{job_id}")
+async def get_build_job(
+    request: Request,
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    job = await request.app.state.job_queue.get_job(job_id, current_user.user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Polling the status counts as following the build
+    await request.app.state.job_queue.touch(job_id)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "last_event_id": job.get("last_seq", 0),
+        "created_at": job["created_at"],
+    }
+
+@page_builder_router.get("/page_builder/jobs/{job_id}/events")
+async def stream_build_job(
+    request: Request,
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    last_event_id: int = 0,
+):
+    """Subscribe to a build, resuming after the Last-Event-ID header (or query parameter)."""
+    job = await request.app.state.job_queue.get_job(job_id, current_user.user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    header_value = request.headers.get("last-event-id", "")
+    if header_value.isdigit():
+        last_event_id = int(header_value)
+    return stream_job_events(request, job_id, last_event_id)
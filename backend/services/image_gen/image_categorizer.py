@@ -0,0 +1,127 @@
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+from dspy import InputField, OutputField, Predict, Signature, context
+from backend.services.image_gen.image_store import prompt_hash
+from backend.utils.llm_utils import execute_llm_call
+from backend.utils.memory_cache import MemoryCacheTier
+
+logger = logging.getLogger('app.image_categorizer')
+
+# details: use the category SectionImageDetails emits, batch: one LLM call per section, keyword: local only.
+# Images without a category from the chosen source fall back to the keyword classifier.
+IMAGE_CATEGORIZER = os.getenv('IMAGE_CATEGORIZER', 'details')
+DEFAULT_CATEGORY = 'general'
+
+KEYWORD_CATEGORIES = {
+    'food': (
+        'food', 'coffee', 'tea', 'dish', 'meal', 'restaurant', 'bakery', 'bread', 'cake', 'pastry', 'fruit',
+        'vegetable', 'cuisine', 'chef', 'kitchen', 'wine', 'beer', 'drink', 'cocktail', 'breakfast', 'dinner',
+        'lunch', 'pizza', 'burger', 'dessert', 'cafe', 'espresso', 'latte', 'bean', 'roastery',
+    ),
+    'technology': (
+        'technology', 'tech', 'computer', 'laptop', 'software', 'code', 'coding', 'data', 'digital', 'robot',
+        'ai', 'server', 'circuit', 'smartphone', 'phone', 'device', 'screen', 'app', 'network', 'cloud',
+        'futuristic', 'dashboard', 'hologram', 'cyber',
+    ),
+    'science': (
+        'science', 'laboratory', 'lab', 'microscope', 'molecule', 'dna', 'chemistry', 'physics', 'experiment',
+        'research', 'scientist', 'space', 'planet', 'galaxy', 'astronomy', 'telescope', 'atom',
+    ),
+    'health': (
+        'health', 'fitness', 'gym', 'yoga', 'medical', 'doctor', 'nurse', 'hospital', 'wellness', 'spa',
+        'exercise', 'clinic', 'dental', 'therapy', 'meditation',
+    ),
+    'business': (
+        'business', 'office', 'meeting', 'corporate', 'finance', 'startup', 'workspace', 'desk', 'conference',
+        'handshake', 'chart', 'marketing', 'consulting', 'coworking',
+    ),
+    'people': (
+        'person', 'people', 'portrait', 'team', 'woman', 'man', 'customer', 'family', 'group', 'smiling',
+        'professional', 'student', 'worker', 'crowd', 'child', 'friends',
+    ),
+    'animals': ('animal', 'dog', 'cat', 'bird', 'horse', 'wildlife', 'pet', 'fish', 'puppy', 'kitten'),
+    'fashion': ('fashion', 'clothing', 'dress', 'shoe', 'jewelry', 'apparel', 'boutique', 'outfit', 'handbag'),
+    'travel': ('travel', 'vacation', 'airplane', 'airport', 'resort', 'tourism', 'luggage', 'adventure', 'tourist'),
+    'architecture': (
+        'building', 'architecture', 'interior', 'house', 'home', 'room', 'city', 'skyline', 'street', 'urban',
+        'hotel', 'storefront', 'shop', 'store', 'lobby', 'apartment',
+    ),
+    'landscapes': (
+        'landscape', 'mountain', 'forest', 'beach', 'ocean', 'sea', 'lake', 'river', 'sunset', 'sunrise',
+        'valley', 'desert', 'countryside', 'nature', 'sky', 'field', 'garden', 'waterfall', 'meadow',
+    ),
+}
+
+# keyword -> category; a keyword listed twice belongs to the first category above
+_KEYWORD_INDEX = {}
+for _category, _keywords in KEYWORD_CATEGORIES.items():
+    for _keyword in _keywords:
+        _KEYWORD_INDEX.setdefault(_keyword, _category)
+
+# prompt_hash -> category, so repeated prompts always land in the same folder
+category_cache = MemoryCacheTier(
+    max_entries=int(os.getenv('IMAGE_CATEGORY_CACHE_ENTRIES', '4096')),
+    ttl=float(os.getenv('IMAGE_CATEGORY_CACHE_TTL', '86400')),
+)
+
+class ImageBatchCategorizer(Signature):
+    """
+    Categorize images based on their prompts, returning exactly one category per prompt in the same order.
+    Example categories: Landscapes, Science, Technology, Food, etc.
+    """
+    prompts: List[str] = InputField()
+    categories: List[str] = OutputField()
+
+def classify_keywords(prompt: str) -> str:
+    """Category whose keywords appear most often in the prompt; earlier matches win ties."""
+    scores: Dict[str, int] = {}
+    for word in re.findall(r'[a-z]+', prompt.lower()):
+        category = _KEYWORD_INDEX.get(word) or (_KEYWORD_INDEX.get(word[:-1]) if word.endswith('s') else None)
+        if category:
+            scores[category] = scores.get(category, 0) + 1
+    # dicts keep insertion order, so max() returns the first category to reach the top score
+    return max(scores, key=scores.get) if scores else DEFAULT_CATEGORY
+
+def categorize_prompt(prompt: str) -> str:
+    """Memoized category of a single prompt; never calls a model."""
+    key = prompt_hash(prompt)
+    category = category_cache.get(key)
+    if category is None:
+        category = classify_keywords(prompt)
+        category_cache.set(key, category)
+    return category
+
+async def categorize_images(images: List[Dict[str, Any]], lm=None) -> List[str]:
+    """
+    One category per image, in order. Memoized categories come first, then the ones emitted
+    with the image details; with IMAGE_CATEGORIZER=batch the rest are classified in a single
+    LLM call, and anything still unknown goes to the keyword classifier.
+    """
+    categories: List[Optional[str]] = []
+    for image in images:
+        category = category_cache.get(prompt_hash(image['prompt']))
+        if category is None and IMAGE_CATEGORIZER != 'keyword':
+            category = str(image.get('category') or '').strip() or None
+            if category:
+                category_cache.set(prompt_hash(image['prompt']), category)
+        categories.append(category)
+
+    missing = [index for index, category in enumerate(categories) if category is None]
+    if missing and IMAGE_CATEGORIZER == 'batch' and lm is not None:
+        prompts = [images[index]['prompt'] for index in missing]
+        try:
+            with context(lm=lm):
+                response = await execute_llm_call(Predict(ImageBatchCategorizer), prompts=prompts)
+            if len(response.categories) != len(prompts):
+                raise ValueError(f"expected {len(prompts)} categories, got {len(response.categories)}")
+            for index, category in zip(missing, response.categories):
+                category = str(category).strip()
+                if category:
+                    categories[index] = category
+                    category_cache.set(prompt_hash(images[index]['prompt']), category)
+        except Exception as e:
+            logger.warning(f"Batch image categorization failed, falling back to keywords: {str(e)}")
+
+    return [category or categorize_prompt(image['prompt']) for category, image in zip(categories, images)]
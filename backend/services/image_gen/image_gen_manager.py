@@ -1,98 +1,139 @@
 import replicate
+from contextlib import nullcontext
 from datetime import datetime
-from dspy import LM, configure, InputField, OutputField, Signature, Predict
+from dspy import LM
 import os
 import re
-from io import BytesIO
+import time
+import uuid
+import requests
+from backend.services.image_gen.image_categorizer import DEFAULT_CATEGORY, categorize_prompt
+from backend.services.image_gen.image_store import IMAGE_MODEL, ImageStore, prompt_hash
+from backend.utils.llm_utils import MODEL_DICT
+from backend.utils.replay import cassette
+from backend.utils.tracing import span
 
-class ImageCategorizer(Signature):
+CATEGORIZER_LLM = os.getenv('IMAGE_CATEGORIZER_LLM', '4o-mini')
+
+class ImageGenerator:
     """
-    Categorize an image based on a prompt, Example categories: Landscapes, Science, Technology, Food, etc.
+    Long-lived per-worker image service; build it once at startup and share it across requests.
+    Its LM backs categorize_images' batch mode and is bound per call with context(), so no
+    global dspy settings are touched.
     """
-    prompt = InputField()
-    category = OutputField()
 
-class ImageGenerator:
-    def __init__(self, ssh_manager):
+    def __init__(self, ssh_manager, lm=None):
         self.ssh_manager = ssh_manager
         self.storage_path = '/mnt/media_storage/generated'
-        lm = LM(model='anthropic/gpt-4o-mini')
-        configure(lm=lm)
+        self.lm = lm or LM(MODEL_DICT[CATEGORIZER_LLM]['model'], max_tokens=MODEL_DICT[CATEGORIZER_LLM]['max_tokens'], cache=False)
         self.is_dev_mode = os.getenv("LOCAL_DEV", "false") == "true"
+        # Dev mode saves under ./mnt and mirrors to the media server over SFTP
+        self.local_root = os.path.join(".", self.storage_path.lstrip('/')) if self.is_dev_mode else self.storage_path
+        self.image_store = ImageStore(self.local_root, ssh_manager=ssh_manager, remote_root=self.storage_path)
 
     def clean_string(self, string):
         return re.sub(r'\s+', '_', re.sub(r'[^a-zA-Z0-9\s]', '', os.path.splitext(string)[0])).lower()
     
     def categorize_image(self, prompt):
-        file_metadata = Predict(ImageCategorizer)(prompt=prompt)
-        return file_metadata.category
+        """Local fallback when the caller did not categorize the prompt with its section."""
+        return categorize_prompt(prompt)
+
+    def iter_image_chunks(self, item, chunk_size=65536):
+        """Yield an output's bytes in chunks without buffering the whole file."""
+        if isinstance(item, str):
+            with requests.get(item, stream=True, timeout=120) as response:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size=chunk_size)
+            return
+        if hasattr(item, '__iter__'):
+            yield from item
+            return
+        # File-like fallback
+        while True:
+            chunk = item.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def local_path_for(self, path):
+        """Local filesystem location of a public /mnt/media_storage/generated path."""
+        relative_path = os.path.relpath(path, self.storage_path)
+        return os.path.join(self.local_root, relative_path)
+
+    def has_image(self, path):
+        return os.path.exists(self.local_path_for(path))
 
-    def generate_image(self, prompt, file_name):
+    def reserve_path(self, file_name, category=None):
+        """Public path an image will be written to once rendered, known before generation starts."""
+        folder = self.clean_string(category or '') or DEFAULT_CATEGORY
+        return os.path.join(self.storage_path, folder, f"{self.clean_string(file_name)}_{uuid.uuid4().hex[:8]}.webp")
+
+    def generate_image(self, prompt, file_name, target_path=None, category=None):
         file_name = self.clean_string(file_name)
         image_input = {
             "prompt": f"{prompt}",
             "guidance": 3.5
         }
 
-        output = replicate.run(
-            "black-forest-labs/flux-dev",
-            input=image_input
-        )
+        replayed = None
+        if cassette and cassette.is_replaying:
+            # Serve the render and its category from the cassette instead of Replicate
+            replayed = cassette.lookup('image', prompt_hash(prompt))
+            time.sleep(cassette.replay_delay(replayed['duration']))
+            output = [cassette.iter_blob(sha256) for sha256 in replayed['response']['blobs']]
+            category = replayed['response']['category']
+        else:
+            started = time.monotonic()
+            with span('image_render', model=IMAGE_MODEL):
+                output = replicate.run(
+                    IMAGE_MODEL,
+                    input=image_input
+                )
 
-        category = self.clean_string(self.categorize_image(prompt))
+            if category is None:
+                category = self.categorize_image(prompt)
+            category = self.clean_string(category) or DEFAULT_CATEGORY
+            render_seconds = time.monotonic() - started
         generated_images = []
         remote_category_path = os.path.join(self.storage_path, category)
 
-        # Dev mode: Save both locally and via SSH
-        if self.is_dev_mode:
-            # First save locally with same path structure
-            local_category_path = os.path.join(".", self.storage_path.lstrip('/'), category)
-            os.makedirs(local_category_path, exist_ok=True)
-
-            ssh_client = self.ssh_manager.get_client()
-            if ssh_client:
-                sftp = ssh_client.open_sftp()
-                
-                try:
-                    sftp.stat(remote_category_path)
-                except FileNotFoundError:
-                    sftp.mkdir(remote_category_path)
-
-                for index, item in enumerate(output):
-                    image_data = item.read()
+        # Only dev mode mirrors to the media server; production writes straight to the shared mount
+        session = self.ssh_manager.sftp_session() if self.is_dev_mode else nullcontext()
+        with session as sftp:
+            for index, item in enumerate(output):
+                if target_path:
+                    # Reserved path handed out before rendering
+                    root, extension = os.path.splitext(target_path)
+                    public_path = target_path if index == 0 else f"{root}_{index}{extension}"
+                elif self.is_dev_mode:
                     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    filename = f"{file_name}_{timestamp}.webp"
-                    
-                    # Save locally
-                    local_file_path = os.path.join(local_category_path, filename)
-                    with open(local_file_path, "wb") as file:
-                        file.write(image_data)
-                    
-                    # Save to remote via SSH
-                    image_data_copy = BytesIO(image_data)
-                    remote_file_path = os.path.join(remote_category_path, filename)
-                    sftp.putfo(image_data_copy, remote_file_path)
-                    
-                    generated_images.append({
-                        "path": os.path.join('/mnt/media_storage/generated', category, filename),
-                        "category": category
-                    })
-                
-                sftp.close()
-                ssh_client.close()
-                return generated_images
+                    public_path = os.path.join(remote_category_path, f"{file_name}_{timestamp}.webp")
+                else:
+                    public_path = os.path.join(remote_category_path, f"{file_name}_{index}.webp")
 
-        # Production: Save locally only
-        os.makedirs(remote_category_path, exist_ok=True)
-        
-        for index, item in enumerate(output):
-            filename = f"{file_name}_{index}.webp"
-            file_path = os.path.join(remote_category_path, filename)
-            with open(file_path, "wb") as file:
-                file.write(item.read())
-            generated_images.append({
-                "path": os.path.join('/mnt/media_storage/generated', category, filename),
-                "category": category
-            })
-        
+                # Includes the download from Replicate and the SFTP mirror in dev mode
+                with span('image_store', sftp=sftp is not None):
+                    sha256 = self.image_store.store(
+                        self.iter_image_chunks(item),
+                        self.local_path_for(public_path),
+                        sftp,
+                        public_path,
+                    )
+                generated_images.append({
+                    "path": public_path,
+                    "category": category,
+                    "sha256": sha256,
+                    "prompt_hash": prompt_hash(prompt),
+                    "model": IMAGE_MODEL,
+                })
+
+        if cassette and cassette.is_recording:
+            self.record_render(prompt, render_seconds, category, generated_images)
         return generated_images
+
+    def record_render(self, prompt, duration, category, generated_images):
+        """Copy the rendered objects into the cassette so replays never reach Replicate."""
+        blobs = [image['sha256'] for image in generated_images]
+        for sha256 in blobs:
+            cassette.store_blob(sha256, self.image_store.object_path(self.local_root, sha256))
+        cassette.record('image', prompt_hash(prompt), duration, {'category': category, 'blobs': blobs})
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Optional
+from backend.utils.tracing import Span, current_span
+
+logger = logging.getLogger('app.image_scheduler')
+
+# Whose queue a render joins; page build jobs set this to the user id
+render_owner: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('render_owner', default=None)
+
+@dataclass(frozen=True)
+class ModelLimits:
+    concurrency: int = 4
+    # Starts per minute, spread evenly; 0 disables rate limiting
+    per_minute: float = 0
+
+@dataclass
+class _RenderJob:
+    owner: str
+    model: str
+    call: Callable[[], Any]
+    future: asyncio.Future
+    span: Optional[Span] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+
+class ImageScheduler:
+    """
+    Runs image renders on a dedicated thread pool. Each model has its own concurrency and rate
+    limit, and waiting renders are started round-robin across owners so one large page cannot
+    starve other users. All scheduling state lives on the event loop thread.
+    """
+
+    def __init__(self, max_workers: int = 8, default_limits: ModelLimits = ModelLimits(), model_limits: Dict[str, ModelLimits] = None):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image')
+        self.default_limits = default_limits
+        self.model_limits = model_limits or {}
+        self._queues: OrderedDict[str, Deque[_RenderJob]] = OrderedDict()
+        self._active_by_model: Dict[str, int] = defaultdict(int)
+        self._next_start_by_model: Dict[str, float] = defaultdict(float)
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.stats = {
+            'queued': 0, 'active': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'peak_queued': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+        }
+
+    def limits_for(self, model: str) -> ModelLimits:
+        return self.model_limits.get(model, self.default_limits)
+
+    async def submit(self, model: str, func: Callable, *args: Any, owner: Optional[str] = None, **kwargs: Any) -> Any:
+        """Queue func(*args, **kwargs) as a render of model and wait for its result."""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        job = _RenderJob(
+            owner=owner or render_owner.get() or 'anonymous',
+            model=model,
+            call=partial(ctx.run, func, *args, **kwargs),
+            future=loop.create_future(),
+            span=current_span(),
+        )
+        self._queues.setdefault(job.owner, deque()).append(job)
+        self.stats['queued'] += 1
+        self.stats['peak_queued'] = max(self.stats['peak_queued'], self.stats['queued'])
+        self._dispatch()
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            self._cancel(job)
+            raise
+
+    def _cancel(self, job: _RenderJob) -> None:
+        queue = self._queues.get(job.owner)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            if not queue:
+                del self._queues[job.owner]
+            self.stats['queued'] -= 1
+            self.stats['cancelled'] += 1
+        # A render already running cannot be interrupted; its result is dropped when it finishes
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        wake_at = None
+        started = True
+        while started and self.stats['active'] < self.max_workers:
+            started = False
+            for owner in list(self._queues):
+                job = self._queues[owner][0]
+                limits = self.limits_for(job.model)
+                if self._active_by_model[job.model] >= limits.concurrency:
+                    continue
+                next_start = self._next_start_by_model[job.model]
+                if next_start > now:
+                    wake_at = next_start if wake_at is None else min(wake_at, next_start)
+                    continue
+                self._start(loop, owner, job, now)
+                started = True
+                # Rescan from the front; the owner just served has moved to the back
+                break
+
+        if wake_at is not None and self._wakeup is None:
+            self._wakeup = loop.call_later(wake_at - now, self._wake)
+
+    def _wake(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def _start(self, loop: asyncio.AbstractEventLoop, owner: str, job: _RenderJob, now: float) -> None:
+        queue = self._queues.pop(owner)
+        queue.popleft()
+        if queue:
+            self._queues[owner] = queue
+
+        limits = self.limits_for(job.model)
+        if limits.per_minute:
+            self._next_start_by_model[job.model] = now + 60 / limits.per_minute
+        self._active_by_model[job.model] += 1
+        wait = now - job.submitted_at
+        self.stats['queued'] -= 1
+        self.stats['active'] += 1
+        self.stats['total_wait_seconds'] += wait
+        self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], wait)
+        if job.span is not None:
+            job.span.add('image_queue_wait_seconds', wait)
+
+        render = loop.run_in_executor(self.executor, job.call)
+        render.add_done_callback(lambda future, job=job: self._finished(job, future))
+
+    def _finished(self, job: _RenderJob, render: asyncio.Future) -> None:
+        self.stats['active'] -= 1
+        self._active_by_model[job.model] -= 1
+        if render.cancelled() or render.exception() is not None:
+            self.stats['failed'] += 1
+        else:
+            self.stats['completed'] += 1
+
+        if not job.future.done():
+            if render.cancelled():
+                job.future.cancel()
+            elif render.exception() is not None:
+                job.future.set_exception(render.exception())
+            else:
+                job.future.set_result(render.result())
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['max_workers'] = self.max_workers
+        stats['waiting_owners'] = len(self._queues)
+        for model, active in self._active_by_model.items():
+            stats[f"active_{re.sub(r'[^a-zA-Z0-9]+', '_', model)}"] = active
+        return stats
+
+    def shutdown(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def create_image_scheduler() -> ImageScheduler:
+    """
+    Build the scheduler from IMAGE_THREAD_POOL_SIZE, IMAGE_RENDER_CONCURRENCY, IMAGE_RENDERS_PER_MINUTE
+    and IMAGE_MODEL_LIMITS, a JSON object of per-model overrides such as
+    {"black-forest-labs/flux-dev": {"concurrency": 2, "per_minute": 30}}.
+    """
+    default_limits = ModelLimits(
+        concurrency=int(os.getenv('IMAGE_RENDER_CONCURRENCY', '4')),
+        per_minute=float(os.getenv('IMAGE_RENDERS_PER_MINUTE', '0')),
+    )
+    overrides = json.loads(os.getenv('IMAGE_MODEL_LIMITS', '{}'))
+    model_limits = {
+        model: ModelLimits(**{**asdict(default_limits), **limits})
+        for model, limits in overrides.items()
+    }
+    return ImageScheduler(
+        max_workers=int(os.getenv('IMAGE_THREAD_POOL_SIZE', '8')),
+        default_limits=default_limits,
+        model_limits=model_limits,
+    )
+
+image_scheduler = create_image_scheduler()
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import posixpath
+import shutil
+import uuid
+
+logger = logging.getLogger('app.image_store')
+
+IMAGE_MODEL = 'black-forest-labs/flux-dev'
+
+def prompt_hash(prompt, model=IMAGE_MODEL):
+    """Stable hash of a whitespace-normalized prompt and the model that renders it."""
+    normalized = ' '.join(prompt.split())
+    return hashlib.sha256(f"{model}\n{normalized}".encode('utf-8')).hexdigest()
+
+class ImageStore:
+    """
+    Content-addressed image store. Bytes live once under objects/<aa>/<sha256>.webp and
+    friendly category paths are hard links to them (symlinks on the SFTP mirror).
+    """
+
+    def __init__(self, local_root, ssh_manager=None, remote_root=None):
+        self.local_root = local_root
+        self.ssh_manager = ssh_manager
+        self.remote_root = remote_root
+
+    def object_path(self, root, sha256):
+        return os.path.join(root, 'objects', sha256[:2], f"{sha256}.webp")
+
+    def store(self, chunks, friendly_path, sftp=None, remote_friendly_path=None):
+        """Stream chunks into the store, link friendly_path to the object and return its SHA-256."""
+        incoming_dir = os.path.join(self.local_root, 'objects', '.incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        incoming_name = f"{uuid.uuid4().hex}.part"
+        tmp_path = os.path.join(incoming_dir, incoming_name)
+        remote_tmp_path = None
+        remote_file = None
+        digest = hashlib.sha256()
+
+        try:
+            if sftp is not None:
+                remote_incoming_dir = posixpath.join(self.remote_root, 'objects', '.incoming')
+                self.ssh_manager.ensure_remote_dir(sftp, remote_incoming_dir)
+                remote_tmp_path = posixpath.join(remote_incoming_dir, incoming_name)
+                remote_file = sftp.open(remote_tmp_path, 'wb')
+                remote_file.set_pipelined(True)
+
+            with open(tmp_path, 'wb') as local_file:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    local_file.write(chunk)
+                    if remote_file is not None:
+                        remote_file.write(chunk)
+            if remote_file is not None:
+                remote_file.close()
+                remote_file = None
+
+            sha256 = digest.hexdigest()
+            self._commit_local(tmp_path, sha256, friendly_path)
+            if sftp is not None:
+                self._commit_remote(sftp, remote_tmp_path, sha256, remote_friendly_path)
+            return sha256
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if remote_file is not None:
+                remote_file.close()
+            if remote_tmp_path is not None:
+                try:
+                    sftp.remove(remote_tmp_path)
+                except IOError:
+                    pass
+            raise
+
+    def _commit_local(self, tmp_path, sha256, friendly_path):
+        object_path = self.object_path(self.local_root, sha256)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, object_path)
+
+        os.makedirs(os.path.dirname(friendly_path), exist_ok=True)
+        link_tmp_path = f"{friendly_path}.{uuid.uuid4().hex}.link"
+        try:
+            os.link(object_path, link_tmp_path)
+        except OSError:
+            # Cross-device or no hard link support
+            shutil.copyfile(object_path, link_tmp_path)
+        os.replace(link_tmp_path, friendly_path)
+
+    def _commit_remote(self, sftp, remote_tmp_path, sha256, remote_friendly_path):
+        remote_object_path = self.object_path(self.remote_root, sha256)
+        self.ssh_manager.ensure_remote_dir(sftp, posixpath.dirname(remote_object_path))
+        try:
+            sftp.stat(remote_object_path)
+            sftp.remove(remote_tmp_path)
+        except FileNotFoundError:
+            sftp.posix_rename(remote_tmp_path, remote_object_path)
+
+        self.ssh_manager.ensure_remote_dir(sftp, posixpath.dirname(remote_friendly_path))
+        try:
+            sftp.remove(remote_friendly_path)
+        except IOError:
+            pass
+        sftp.symlink(remote_object_path, remote_friendly_path)
+
+async def find_cached_image(db, prompt, model=IMAGE_MODEL):
+    """Most recent generated image for this prompt and model, if any."""
+    collection = db.get_collection('generated_images')
+    document = await collection.find_one(
+        {'prompt_hash': prompt_hash(prompt, model), 'model': model, 'sha256': {'$exists': True}},
+        sort=[('created_at', -1)],
+    )
+    if not document:
+        return None
+    return {
+        'path': document['path'],
+        'category': document['category'],
+        'sha256': document['sha256'],
+        'prompt_hash': document['prompt_hash'],
+        'model': document['model'],
+        'cached': True,
+    }
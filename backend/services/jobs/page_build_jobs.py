@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+from backend.services.image_gen.image_scheduler import render_owner
+from backend.services.page_builder.page_builder import page_builder_pipeline
+from backend.services.quota.rate_limits import rate_limiter
+
+logger = logging.getLogger('app.page_build_jobs')
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+FINISHED_STATES = (COMPLETED, FAILED)
+# section_partial events of one section arriving within this many seconds are stored as one event
+PARTIAL_FLUSH_INTERVAL = float(os.getenv('PAGE_BUILD_PARTIAL_FLUSH_INTERVAL', '0.5'))
+
+def merge_partial(pending: Dict[int, Dict[str, Any]], event: Dict[str, Any]) -> None:
+    """Fold a section_partial event into the one still waiting to be stored for its section."""
+    previous = pending.get(event['index'])
+    if previous is None or event.get('reset'):
+        pending[event['index']] = {**event, 'reset': bool(event.get('reset') or (previous or {}).get('reset'))}
+    else:
+        previous['markup'] += event['markup']
+        previous['pending_images'] = event.get('pending_images', previous.get('pending_images', []))
+
+class PageBuildJobQueue:
+    """
+    MongoDB-backed queue of page builds. Workers claim jobs atomically, store every pipeline
+    event with a sequence number and reclaim jobs whose worker stopped heartbeating. Builds that
+    no client has followed for abandon_after seconds are stopped.
+    """
+
+    def __init__(
+        self,
+        db,
+        max_concurrent_jobs: int = None,
+        poll_interval: float = 0.5,
+        heartbeat_interval: float = 10,
+        stale_after: float = 60,
+        max_attempts: int = 2,
+        abandon_after: float = None,
+        partial_flush_interval: float = PARTIAL_FLUSH_INTERVAL,
+    ):
+        self.db = db
+        self.jobs = db.get_collection('page_build_jobs')
+        self.events = db.get_collection('page_build_events')
+        self.max_concurrent_jobs = max_concurrent_jobs or int(os.getenv('PAGE_BUILD_WORKER_JOBS', '2'))
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.abandon_after = abandon_after if abandon_after is not None else float(os.getenv('PAGE_BUILD_ABANDON_AFTER', '300'))
+        self.partial_flush_interval = partial_flush_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running_jobs: Dict[str, asyncio.Task] = {}
+        # Highest stored event seq per running job; persisted with the heartbeat and on finish
+        self._last_seqs: Dict[ObjectId, int] = {}
+        self._worker_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._worker_task = asyncio.create_task(self._worker_loop())
+        logger.info(f"Page build worker {self.worker_id} started")
+
+    async def stop(self) -> None:
+        if self._worker_task:
+            self._worker_task.cancel()
+        for task in list(self._running_jobs.values()):
+            task.cancel()
+        # Cancelled jobs stop heartbeating and are reclaimed by another worker
+        await asyncio.gather(*self._running_jobs.values(), return_exceptions=True)
+
+    async def submit(self, user_id: str, prompt: str, protocol_version: int, quota_receipt: Dict[str, Any] = None) -> str:
+        now = datetime.now(timezone.utc)
+        result = await self.jobs.insert_one({
+            'user_id': user_id,
+            'prompt': prompt,
+            'protocol_version': protocol_version,
+            'quota_receipt': quota_receipt,
+            'status': QUEUED,
+            'attempts': 0,
+            'last_seq': 0,
+            'last_seen_at': now,
+            'created_at': now,
+            'updated_at': now,
+        })
+        return str(result.inserted_id)
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await self.jobs.find_one(
+            {'_id': ObjectId(job_id), 'user_id': user_id},
+            {'prompt': 0, 'quota_receipt': 0},
+        )
+
+    async def _claim_job(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await self.jobs.find_one_and_update(
+            {
+                '$or': [
+                    {'status': QUEUED},
+                    {'status': RUNNING, 'heartbeat_at': {'$lt': now - timedelta(seconds=self.stale_after)}},
+                ],
+            },
+            {
+                '$set': {'status': RUNNING, 'worker_id': self.worker_id, 'heartbeat_at': now, 'updated_at': now},
+                '$inc': {'attempts': 1},
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                job = None
+                if len(self._running_jobs) < self.max_concurrent_jobs:
+                    job = await self._claim_job()
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                job_id = str(job['_id'])
+                task = asyncio.create_task(self._run_job(job))
+                self._running_jobs[job_id] = task
+                task.add_done_callback(lambda _, job_id=job_id: self._running_jobs.pop(job_id, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Page build worker error: {str(e)}", exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+
+    async def touch(self, job_id: str) -> None:
+        """Record that a client is following the job."""
+        await self.jobs.update_one({'_id': ObjectId(job_id)}, {'$set': {'last_seen_at': datetime.now(timezone.utc)}})
+
+    async def _heartbeat(self, job_id: ObjectId, run_task: asyncio.Task, abandoned: asyncio.Event) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = datetime.now(timezone.utc)
+            await self.jobs.update_one(
+                {'_id': job_id, 'worker_id': self.worker_id},
+                {'$set': {'heartbeat_at': now, 'last_seq': self._last_seqs.get(job_id, 0)}},
+            )
+            if self.abandon_after and await self.jobs.find_one(
+                {'_id': job_id, 'last_seen_at': {'$lt': now - timedelta(seconds=self.abandon_after)}},
+                {'_id': 1},
+            ):
+                logger.info(f"Page build job {job_id} has no followers, stopping it")
+                abandoned.set()
+                run_task.cancel()
+                return
+
+    async def _append_event(self, job_id: ObjectId, seq: int, data: str) -> None:
+        await self._append_events(job_id, seq - 1, [data])
+
+    async def _append_events(self, job_id: ObjectId, seq: int, datas: List[str]) -> int:
+        """Store events after seq in one write and return the last seq used."""
+        if not datas:
+            return seq
+        now = datetime.now(timezone.utc)
+        await self.events.insert_many([
+            {'job_id': job_id, 'seq': seq + offset, 'data': data, 'created_at': now}
+            for offset, data in enumerate(datas, 1)
+        ])
+        seq += len(datas)
+        self._last_seqs[job_id] = seq
+        return seq
+
+    async def _resume_seq(self, job: Dict[str, Any]) -> int:
+        # last_seq is only persisted periodically, so a reclaimed job continues after its newest event
+        newest = await self.events.find_one({'job_id': job['_id']}, {'seq': 1}, sort=[('seq', -1)])
+        return max(job.get('last_seq', 0), newest['seq'] if newest else 0)
+
+    async def _finish(self, job_id: ObjectId, status: str) -> None:
+        await self.jobs.update_one(
+            {'_id': job_id},
+            {'$set': {
+                'status': status,
+                'last_seq': self._last_seqs.pop(job_id, 0),
+                'updated_at': datetime.now(timezone.utc),
+            }},
+        )
+
+    async def _refund_quota(self, job: Dict[str, Any]) -> None:
+        """Give the build back to the user's quota, at most once per job."""
+        if not job.get('quota_receipt'):
+            return
+        result = await self.jobs.update_one(
+            {'_id': job['_id'], 'quota_refunded': {'$ne': True}},
+            {'$set': {'quota_refunded': True}},
+        )
+        if result.modified_count:
+            await rate_limiter.refund(self.db, job['user_id'], job['quota_receipt'])
+            logger.info(f"Refunded quota for page build job {job['_id']}")
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        job_id = job['_id']
+        seq = await self._resume_seq(job)
+        self._last_seqs[job_id] = seq
+        status = COMPLETED
+        cancelled = False
+        refundable = False
+        # Whether any attempt of this build got model output; earlier failures are not charged
+        billable = bool(job.get('billable'))
+        abandoned = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, asyncio.current_task(), abandoned))
+        # Image renders from this build queue fairly against other users' builds
+        render_owner.set(job['user_id'])
+
+        async def mark_billable() -> None:
+            nonlocal billable
+            billable = True
+            await self.jobs.update_one({'_id': job_id}, {'$set': {'billable': True}})
+
+        try:
+            if job['attempts'] > self.max_attempts:
+                seq += 1
+                await self._append_event(job_id, seq, json.dumps({
+                    "type": "error",
+                    "message": "Build was interrupted too many times",
+                }))
+                status = FAILED
+                refundable = not billable
+                return
+
+            if job['attempts'] > 1:
+                seq += 1
+                await self._append_event(job_id, seq, json.dumps({
+                    "type": "progress",
+                    "message": "🔁 Resuming interrupted build...",
+                }))
+
+            partials: Dict[int, Dict[str, Any]] = {}
+            partials_flushed_at = time.monotonic()
+            async for sse_message in page_builder_pipeline(
+                job['prompt'],
+                self.db,
+                protocol_version=job.get('protocol_version', 1),
+                on_billable=mark_billable,
+            ):
+                data = sse_message.removeprefix('data: ').strip()
+                event = json.loads(data)
+                batch = []
+                if event.get('type') == 'section_partial':
+                    merge_partial(partials, event)
+                    if time.monotonic() - partials_flushed_at < self.partial_flush_interval:
+                        continue
+                else:
+                    if event.get('type') == 'error':
+                        status = FAILED
+                        # Failures before any model output are not charged
+                        refundable = event.get('billable') is False and not billable
+                    # Other events follow the partials of their section
+                    batch.append(data)
+                batch[:0] = [json.dumps(partial) for partial in partials.values()]
+                partials.clear()
+                partials_flushed_at = time.monotonic()
+                seq = await self._append_events(job_id, seq, batch)
+        except asyncio.CancelledError:
+            if not abandoned.is_set():
+                # Leave the job running so another worker reclaims it once the heartbeat goes stale
+                cancelled = True
+                raise
+            # Stopped by _heartbeat; queued image renders were cancelled with the pipeline
+            asyncio.current_task().uncancel()
+            seq += 1
+            await self._append_event(job_id, seq, json.dumps({
+                "type": "error",
+                "message": "Build stopped because no client was following it",
+            }))
+            status = FAILED
+            refundable = not billable
+        except Exception as e:
+            logger.error(f"Page build job {job_id} failed: {str(e)}", exc_info=True)
+            seq += 1
+            await self._append_event(job_id, seq, json.dumps({"type": "error", "message": f"Pipeline error: {str(e)}"}))
+            status = FAILED
+            refundable = not billable
+        finally:
+            heartbeat.cancel()
+            if cancelled:
+                self._last_seqs.pop(job_id, None)
+            else:
+                await self._finish(job_id, status)
+                if status == FAILED and refundable:
+                    await self._refund_quota(job)
+
+    async def stream_events(
+        self,
+        job_id: str,
+        last_event_id: int = 0,
+    ) -> AsyncGenerator[Tuple[int, str], None]:
+        """Yield (seq, data) for events after last_event_id until the job finishes."""
+        object_id = ObjectId(job_id)
+        last_touch = 0.0
+        while True:
+            job = await self.jobs.find_one({'_id': object_id}, {'status': 1, 'last_seq': 1})
+            if job is None:
+                return
+            if job['status'] not in FINISHED_STATES and time.monotonic() - last_touch > self.heartbeat_interval:
+                await self.touch(job_id)
+                last_touch = time.monotonic()
+
+            events = await self.events.find(
+                {'job_id': object_id, 'seq': {'$gt': last_event_id}},
+                {'seq': 1, 'data': 1},
+            ).sort('seq', 1).to_list(length=None)
+            for event in events:
+                last_event_id = event['seq']
+                yield event['seq'], event['data']
+
+            if job['status'] in FINISHED_STATES and last_event_id >= job.get('last_seq', 0):
+                return
+            if not events:
+                await asyncio.sleep(self.poll_interval)
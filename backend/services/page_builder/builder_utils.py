@@ -31,25 +31,82 @@ COMPONENT_SCAFFOLD = '''
 def format_sse(data):
     return f"data: {json.dumps(data)}\n\n"
 
+def render_scaffold(styles: str, markup: str) -> str:
+    """Fill the scaffold with already-cleaned styles and markup."""
+    return COMPONENT_SCAFFOLD.format(
+        component_title="",
+        component_styles=styles,
+        component_markup=markup,
+        script_imports="",
+    )
+
 def create_component_scaffold(styles: str, markup: List[str]) -> str:
     cleaned_styles = clean_markup(styles)
     cleaned_markup = [clean_markup(section) for section in markup]
     
-    return COMPONENT_SCAFFOLD.format(
-        component_title="",
-        component_styles=cleaned_styles,
-        component_markup="\n".join(cleaned_markup),
-        script_imports="",
+    return render_scaffold(cleaned_styles, "\n".join(cleaned_markup))
+
+def create_scaffold_shell(global_styles: str) -> str:
+    """Scaffold with the global styles and an empty root, patched in place by section deltas."""
+    cleaned_styles = clean_markup(global_styles) if global_styles.strip() else ""
+    return render_scaffold(
+        f'<style id="component-styles">{cleaned_styles}</style>',
+        "",
     )
 
+MARKUP_NOISE_TOKENS = ('```html', 'css', 'javascript', '```')
+MARKUP_NOISE_PATTERN = re.compile('|'.join(re.escape(token) for token in MARKUP_NOISE_TOKENS))
+
 def clean_markup(markup):
     try:
         if not isinstance(markup, str):
             raise ValueError("Input must be a string")
         if not markup.strip():
             raise ValueError("Input string is empty")
-        clean_text = re.sub(r'```html|css|javascript|```', '', markup)
+        clean_text = MARKUP_NOISE_PATTERN.sub('', markup)
         return clean_text.strip()
         
     except re.error as e:
         raise ValueError(f"Error cleaning HTML: {str(e)}")
+
+class MarkupStreamCleaner:
+    """
+    Incremental clean_markup for streamed text. A chunk ending in what may be the start of a noise
+    token ("``", "jav") is held back until the next chunk decides it, so the concatenated output
+    matches clean_markup of the whole text apart from trailing whitespace.
+    """
+
+    def __init__(self):
+        self.held = ''
+        self.started = False
+
+    def feed(self, chunk: str) -> str:
+        text = self.held + chunk
+        cut = len(text)
+        matches = list(MARKUP_NOISE_PATTERN.finditer(text))
+        for match in matches:
+            # "```" at the end may still become "```html"
+            if self._is_partial_token(text[match.start():]):
+                cut = match.start()
+                break
+        for index in range(max(0, len(text) - max(map(len, MARKUP_NOISE_TOKENS)) + 1), cut):
+            inside_match = any(match.start() < index < match.end() for match in matches)
+            if not inside_match and self._is_partial_token(text[index:]):
+                cut = index
+                break
+        self.held = text[cut:]
+        return self._emit(MARKUP_NOISE_PATTERN.sub('', text[:cut]))
+
+    def flush(self) -> str:
+        text, self.held = self.held, ''
+        return self._emit(MARKUP_NOISE_PATTERN.sub('', text))
+
+    @staticmethod
+    def _is_partial_token(tail: str) -> bool:
+        return any(token.startswith(tail) and token != tail for token in MARKUP_NOISE_TOKENS)
+
+    def _emit(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
@@ -0,0 +1,76 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+SIMPLE = 'simple'
+COMPLEX = 'complex'
+# Terms this strong decide the scope even when weaker terms of the other level follow
+STRONG_WEIGHT = 3
+
+# (phrase, level, weight); each phrase is grouped and matched on word boundaries, case-insensitively
+COMPLEXITY_TERMS: List[Tuple[str, str, int]] = [
+    ('landing page', COMPLEX, 3),
+    ('home ?page', COMPLEX, 3),
+    ('dashboard', COMPLEX, 3),
+    ('web ?site', COMPLEX, 3),
+    ('web app(?:lication)?', COMPLEX, 3),
+    ('admin (?:panel|portal)', COMPLEX, 3),
+    ('e-?commerce', COMPLEX, 3),
+    ('online (?:store|shop)', COMPLEX, 3),
+    ('multi-?page', COMPLEX, 3),
+    ('multiple (?:pages|sections|components)', COMPLEX, 3),
+    ('portfolio', COMPLEX, 2),
+    ('blog', COMPLEX, 2),
+    ('saas', COMPLEX, 2),
+    ('app', COMPLEX, 2),
+    ('application', COMPLEX, 2),
+    ('site', COMPLEX, 2),
+    ('page', COMPLEX, 2),
+    ('(?:login|log in|sign ?in|sign ?up|signup|register|registration|contact|checkout|search) form', SIMPLE, 3),
+    ('pricing (?:table|card)s?', SIMPLE, 3),
+    ('form', SIMPLE, 2),
+    ('button', SIMPLE, 2),
+    ('card', SIMPLE, 2),
+    ('table', SIMPLE, 2),
+    ('modal', SIMPLE, 2),
+    ('nav ?bar|navigation bar', SIMPLE, 2),
+    ('footer', SIMPLE, 2),
+    ('header', SIMPLE, 2),
+    ('hero section', SIMPLE, 2),
+    ('component', SIMPLE, 2),
+    ('widget', SIMPLE, 2),
+    ('(?:drop ?down|tooltip|badge|alert|accordion|carousel|breadcrumb|pagination|progress bar|spinner|toast)', SIMPLE, 2),
+]
+
+_PATTERNS = [
+    (re.compile(rf'\b(?:{phrase})s?\b', re.IGNORECASE), level, weight)
+    for phrase, level, weight in COMPLEXITY_TERMS
+]
+
+@dataclass
+class ComplexityGuess:
+    """Local guess at ComplexityAnalyzer's answer; only confident guesses skip the LLM."""
+    level: str
+    confident: bool
+
+def classify_complexity(prompt: str) -> ComplexityGuess:
+    """
+    The earliest matched term is taken as the request's scope ("a login form for my dashboard"
+    is a form). The guess is confident when every term agrees or the scope term is a strong one.
+    """
+    hits = sorted(
+        (match.start(), -weight, match.end(), level)
+        for pattern, level, weight in _PATTERNS
+        for match in pattern.finditer(prompt)
+    )
+    if not hits:
+        # Most unmatched prompts describe whole pages
+        return ComplexityGuess(level=COMPLEX, confident=False)
+
+    _, first_weight, first_end, first_level = hits[0]
+    conflicts = [start for start, _, _, level in hits if level != first_level]
+    if not conflicts:
+        return ComplexityGuess(level=first_level, confident=True)
+    # "dashboard card": a term of the other level right after the scope term is the real head noun
+    modified = conflicts[0] <= first_end + 1
+    return ComplexityGuess(level=first_level, confident=-first_weight >= STRONG_WEIGHT and not modified)
@@ -1,20 +1,29 @@
 from datetime import datetime, timezone
 import logging
+import os
 import time
 import asyncio
 import uuid
-from typing import Dict, List, Any, Optional, AsyncGenerator
+from typing import Awaitable, Callable, Dict, List, Any, Optional, AsyncGenerator, Tuple
 from dataclasses import dataclass
 from dspy import ChainOfThought, context, Predict
 from backend.core.ssh_manager import SSHManager
+from backend.services.image_gen.image_categorizer import categorize_images
 from backend.services.image_gen.image_gen_manager import ImageGenerator
+from backend.services.image_gen.image_scheduler import image_scheduler
+from backend.services.image_gen.image_store import IMAGE_MODEL, find_cached_image
+from backend.services.page_builder.complexity import COMPLEX, classify_complexity
 from backend.services.page_builder.signatures import PageBuilderSignatures as Sigs
 from backend.services.page_builder.builder_utils import (
     format_sse,
     clean_markup,
+    MarkupStreamCleaner,
     create_component_scaffold,
+    create_scaffold_shell,
+    render_scaffold,
 )
-from backend.utils.llm_utils import execute_llm_call, initialize_llm
+from backend.utils.llm_utils import StreamingPredict, execute_llm_call, initialize_llm
+from backend.utils.tracing import span
 
 logger = logging.getLogger('app.component_builder')
 
@@ -22,9 +31,25 @@ logger = logging.getLogger('app.component_builder')
 IS_DEV_MODE = True
 LLM = 'haiku'
 STRONG_LLM = 'sonnet'
+# Maximum number of sections built at the same time; 1 restores sequential processing
+SECTION_CONCURRENCY = int(os.getenv('SECTION_CONCURRENCY', '3'))
+# SSE protocol versions: 1 resends the full document per section, 2 sends a shell once and then deltas
+PROTOCOL_FULL_DOCUMENT = 1
+PROTOCOL_DELTA = 2
+# With the delta protocol, build markup against reserved image paths and push images as they render
+DEFER_IMAGES = os.getenv('DEFER_IMAGES', 'true') == 'true'
+# With the delta protocol, stream each section's markup to the preview while the model writes it
+STREAM_SECTION_MARKUP = os.getenv('STREAM_SECTION_MARKUP', 'true') == 'true'
+# Minimum seconds between section_partial events of one section; each event is stored for resumption
+SECTION_PARTIAL_INTERVAL = float(os.getenv('SECTION_PARTIAL_INTERVAL', '0.3'))
+# Answer obvious prompts with the local complexity classifier instead of an LLM call
+COMPLEXITY_HEURISTIC = os.getenv('COMPLEXITY_HEURISTIC', 'true') == 'true'
+# While the LLM analyzes an unclear prompt, start the likely architect call and discard it if the guess was wrong
+SPECULATIVE_ARCHITECT = os.getenv('SPECULATIVE_ARCHITECT', 'false') == 'true'
 
 ssh_manager = SSHManager(is_dev_mode=IS_DEV_MODE, logger=logger)
 lm, strong_lm = initialize_llm(LLM, STRONG_LLM)
+image_generator = ImageGenerator(ssh_manager)
 
 @dataclass
 class PipelineResult:
@@ -32,68 +57,128 @@ class PipelineResult:
     result: Any = None
     progress_message: Optional[Dict] = None
 
-async def page_builder_pipeline(prompt: str, db) -> AsyncGenerator[str, None]:
-    """Build a web page based on the given prompt."""
+async def page_builder_pipeline(
+    prompt: str,
+    db,
+    protocol_version: int = PROTOCOL_FULL_DOCUMENT,
+    on_billable: Optional[Callable[[], Awaitable[None]]] = None,
+) -> AsyncGenerator[str, None]:
+    """Build a web page based on the given prompt; on_billable is awaited once a model has produced output."""
     pipeline_id = uuid.uuid4()
     pipeline_logger = logging.getLogger(f'app.component_builder.pipeline_{pipeline_id}')
     start_time = time.time()
     pipeline_logger.info(f"Pipeline {pipeline_id} started for prompt: {prompt[:100]}...")
 
-    try:
-        # Analyze complexity
-        yield format_sse({"type": "progress", "message": "🎯 Analyzing requirements..."})
-        complexity_level = await analyze_complexity(prompt)
-
-        parts = []
-        styles = []
-        images = []
-
-        # Design components
-        async for result in design_components(prompt, complexity_level):
-            if result.progress_message:
-                yield format_sse(result.progress_message)
-            if result.result:
-                components_result = result.result
-                if isinstance(components_result, tuple) and len(components_result) == 2:
-                    parts, styles = components_result
+    # Set once a model has produced output; earlier failures are refunded to the user's quota
+    billable = False
+    speculation = None
+    with span('pipeline', trace_id=pipeline_id.hex) as pipeline_span:
+        try:
+            # Analyze complexity
+            yield format_sse({"type": "progress", "message": "🎯 Analyzing requirements..."})
+            speculation = speculate_architect(prompt)
+            complexity_level, answered_by_model = await analyze_complexity(prompt)
+            # A heuristic answer is not model output; the build becomes billable with the architect's
+            billable = answered_by_model
+            if billable and on_billable:
+                await on_billable()
+            architect_task = None
+            if speculation:
+                guessed_level, task = speculation
+                if guessed_level == complexity_level:
+                    architect_task = task
                 else:
-                    raise ValueError("Invalid component design result format")
-        if not parts or not styles:
-            raise ValueError("Component design did not produce valid results")
-
-        # Process sections
-        async for result in process_sections(parts, styles, pipeline_logger):
-            if result.progress_message:
-                yield format_sse(result.progress_message)
-            if result.result:
-                images = result.result
-
-        await save_images_to_db(images, db)
-
-        # Final outputs
-        yield format_sse({
-            "type": "pipeline_complete",
-            "build_time": time.time() - start_time,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        })
-        pipeline_logger.info(f"Pipeline {pipeline_id} completed successfully.")
-    except Exception as e:
-        pipeline_logger.error(f"Pipeline {pipeline_id} failed: {str(e)}", exc_info=True)
-        yield format_sse({"type": "error", "message": str(e)})
-
-async def analyze_complexity(prompt: str) -> str:
+                    task.cancel()
+                    pipeline_logger.info(f"Discarded speculative {guessed_level} design, prompt is {complexity_level}")
+
+            parts = []
+            styles = []
+            images = []
+
+            # Design components
+            async for result in design_components(prompt, complexity_level, architect_task):
+                if result.progress_message:
+                    yield format_sse(result.progress_message)
+                if result.result:
+                    if not billable and on_billable:
+                        await on_billable()
+                    billable = True
+                    components_result = result.result
+                    if isinstance(components_result, tuple) and len(components_result) == 2:
+                        parts, styles = components_result
+                    else:
+                        raise ValueError("Invalid component design result format")
+            if not parts or not styles:
+                raise ValueError("Component design did not produce valid results")
+
+            # Process sections
+            async for result in process_sections(parts, styles, pipeline_logger, protocol_version=protocol_version, db=db):
+                if result.progress_message:
+                    yield format_sse(result.progress_message)
+                if result.result:
+                    images = result.result
+
+            with span('save_images', count=len(images)):
+                await save_images_to_db(images, db)
+
+            # Final outputs
+            yield format_sse({
+                "type": "pipeline_complete",
+                "build_time": time.time() - start_time,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "trace_id": pipeline_span.trace_id,
+            })
+            pipeline_logger.info(f"Pipeline {pipeline_id} completed successfully.")
+        except Exception as e:
+            pipeline_span.status = 'error'
+            pipeline_logger.error(f"Pipeline {pipeline_id} failed: {str(e)}", exc_info=True)
+            yield format_sse({"type": "error", "message": str(e), "billable": billable})
+        finally:
+            if speculation:
+                speculation[1].cancel()
+
+async def analyze_complexity(prompt: str) -> Tuple[str, bool]:
+    """Complexity level and whether a model produced it rather than the local classifier."""
     try:
-        with context(lm=lm):   
-            complexity_analysis = await execute_llm_call(
-                Predict(Sigs.ComplexityAnalyzer),
-                description=prompt,
-            )
-        complexity_level = complexity_analysis.complexity_level.lower()
-        return complexity_level
+        with span('analyze_complexity') as complexity_span:
+            guess = classify_complexity(prompt) if COMPLEXITY_HEURISTIC else None
+            if guess and guess.confident:
+                complexity_span.set(source='heuristic')
+                return guess.level, False
+            complexity_span.set(source='llm')
+            with context(lm=lm):
+                complexity_analysis = await execute_llm_call(
+                    Predict(Sigs.ComplexityAnalyzer),
+                    description=prompt,
+                )
+        complexity_level = complexity_analysis.complexity_level.strip().lower()
+        return complexity_level, True
     except Exception as e:
         raise Exception(f"Error analyzing complexity: {str(e)}") from e
 
-async def design_components(prompt: str, complexity_level: str) -> AsyncGenerator[PipelineResult, None]:
+def speculate_architect(prompt: str) -> Optional[Tuple[str, asyncio.Task]]:
+    """When enabled and the prompt needs the LLM analysis, start the likely architect call alongside it."""
+    if not SPECULATIVE_ARCHITECT:
+        return None
+    guess = classify_complexity(prompt)
+    if COMPLEXITY_HEURISTIC and guess.confident:
+        return None
+    task = asyncio.create_task(run_architect(prompt, guess.level, speculative=True))
+    # A discarded guess may fail unobserved; retrieve its exception so it is not reported as lost
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return guess.level, task
+
+async def run_architect(prompt: str, complexity_level: str, speculative: bool = False) -> Any:
+    signature = Sigs.WebAppArchitect if complexity_level == COMPLEX else Sigs.WebComponentArchitect
+    with span('design_components', speculative=speculative), context(lm=strong_lm):
+        return await execute_llm_call(ChainOfThought(signature), description=prompt)
+
+async def design_components(
+    prompt: str,
+    complexity_level: str,
+    architect_task: Optional[asyncio.Task] = None,
+) -> AsyncGenerator[PipelineResult, None]:
+    """Design the page's parts; architect_task is a speculative architect call already running for this level."""
     parts = []
     styles = []
     name_key = ''
@@ -103,11 +188,7 @@ async def design_components(prompt: str, complexity_level: str) -> AsyncGenerato
             yield PipelineResult(
                 progress_message={"type": "progress", "message": "🚧 Breaking down complex request..."}
             )
-            with context(lm=strong_lm):
-                web_app_architect = await execute_llm_call(
-                    ChainOfThought(Sigs.WebAppArchitect),
-                    description=prompt,
-                )
+            web_app_architect = await (architect_task or run_architect(prompt, complexity_level))
             parts.extend(web_app_architect.sections)
             styles.append(web_app_architect.global_css)
             name_key = 'section_name'
@@ -118,11 +199,7 @@ async def design_components(prompt: str, complexity_level: str) -> AsyncGenerato
             yield PipelineResult(
                 progress_message={"type": "progress", "message": "🏗️ Designing component..."}
             )
-            with context(lm=strong_lm):
-                component_architect = await execute_llm_call(
-                    ChainOfThought(Sigs.WebComponentArchitect),
-                    description=prompt,
-                )
+            component_architect = await (architect_task or run_architect(prompt, complexity_level))
             parts.append(component_architect.component_spec)
             styles.append(f"/*Global CSS*/\n{component_architect.global_css}\n/*End Global CSS*/")
             name_key = 'component_name'
@@ -135,81 +212,274 @@ async def design_components(prompt: str, complexity_level: str) -> AsyncGenerato
     except Exception as e:
         raise Exception(f"Error designing components: {str(e)}") from e
 
+async def drain_events_until(task: asyncio.Task, events: asyncio.Queue) -> AsyncGenerator[Dict[str, Any], None]:
+    """Yield queued events while waiting for task to finish."""
+    while not task.done():
+        getter = asyncio.ensure_future(events.get())
+        done, _ = await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            yield getter.result()
+        else:
+            getter.cancel()
+    while not events.empty():
+        yield events.get_nowait()
+
 async def process_sections(
     parts: List[Dict[str, Any]],
     styles: List[str],
     pipeline_logger: logging.Logger,
+    concurrency: int = SECTION_CONCURRENCY,
+    protocol_version: int = PROTOCOL_FULL_DOCUMENT,
+    db=None,
 ) -> AsyncGenerator[PipelineResult, None]:
+    """Build sections concurrently and stream them back in section order."""
     images = []
     cumulative_markups = []
-    
-    for index, section in enumerate(parts, 1):
-        try:
-            yield PipelineResult(
-                progress_message={
-                    "type": "progress",
-                    "message": f"🏗️ Section {index}/{len(parts)}: {section['name']}",
-                    "progress": (index / len(parts)) * 100,
-                }
-            )
+    cleaned_styles = []
+    render_tasks = []
+    global_css = styles[0] if styles else ''
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    is_delta = protocol_version >= PROTOCOL_DELTA
+    # Rendered images and partial markup from every running section, forwarded as they arrive
+    section_events = asyncio.Queue() if is_delta else None
+    image_events = section_events if DEFER_IMAGES else None
+
+    # Sequential builds style each section against the previous section's CSS, as they always did;
+    # concurrent sections cannot wait for their neighbours, so they all get the global CSS
+    chain_styles = concurrency <= 1
+    previous_css = global_css
+
+    async def run_section(index: int, section: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal previous_css
+        partials = None
+        if section_events is not None and STREAM_SECTION_MARKUP:
+            partials = SectionPartials(section_events, index, section['name'])
+        async with semaphore:
+            context_css = previous_css if chain_styles else global_css
+            with span('section', section=section['name']):
+                result = await process_section(section, context_css, pipeline_logger, db, image_events, partials)
+            if chain_styles:
+                chained = []
+                append_style(chained, section['name'], result['style']['css_rules'], result['style']['transitions'])
+                previous_css = chained[-1]
+            return result
+
+    tasks = [asyncio.create_task(run_section(index, section)) for index, section in enumerate(parts, 1)]
+
+    if is_delta:
+        cleaned_styles.extend(clean_markup(style) for style in styles if style.strip())
+        yield PipelineResult(
+            progress_message={"type": "scaffold", "content": create_scaffold_shell(' '.join(styles))}
+        )
 
-            # Process single section
-            result = await process_section(section, styles, pipeline_logger)
-            
-            if isinstance(result, dict):
-                images.extend(result.get('images', []))
-                cumulative_markups.append(result['markup'])
-                current_scaffold = create_component_scaffold(
-                    styles=f"<style>{' '.join(styles)}</style>",
-                    markup=cumulative_markups,
+    try:
+        for index, (section, task) in enumerate(zip(parts, tasks), 1):
+            try:
+                yield PipelineResult(
+                    progress_message={
+                        "type": "progress",
+                        "message": f"🏗️ Section {index}/{len(parts)}: {section['name']}",
+                        "progress": (index / len(parts)) * 100,
+                    }
                 )
 
+                # Wait for the section at the head of the queue, forwarding images that land meanwhile
+                if section_events is not None:
+                    async for event in drain_events_until(task, section_events):
+                        yield PipelineResult(progress_message=event)
+                result = await task
+
+                if isinstance(result, dict):
+                    images.extend(result.get('images', []))
+                    render_tasks.extend(result.get('render_tasks', []))
+                    append_style(styles, section['name'], result['style']['css_rules'], result['style']['transitions'])
+                    cumulative_markups.append(result['markup'])
+
+                    if is_delta:
+                        # Markup is already cleaned by build_page_section; only the new CSS needs it
+                        cleaned_styles.append(clean_markup(styles[-1]))
+                        yield PipelineResult(
+                            progress_message={
+                                "type": "section_delta",
+                                "index": index,
+                                "name": section['name'],
+                                "markup": result['markup'],
+                                "css": cleaned_styles[-1],
+                                "pending_images": result.get('pending_images', []),
+                            }
+                        )
+                        continue
+
+                    current_scaffold = create_component_scaffold(
+                        styles=f"<style>{' '.join(styles)}</style>",
+                        markup=cumulative_markups,
+                    )
+
+                    yield PipelineResult(
+                        progress_message={"type": "section_complete", "content": current_scaffold}
+                    )
+
+            except Exception as e:
+                pipeline_logger.error(f"Error processing section: {str(e)}", exc_info=True)
                 yield PipelineResult(
-                    progress_message={"type": "section_complete", "content": current_scaffold}
+                    progress_message={"type": "warning", "message": f"Section issue: {str(e)}"}
                 )
-            
-        except Exception as e:
-            pipeline_logger.error(f"Error processing section: {str(e)}", exc_info=True)
-            yield PipelineResult(
-                progress_message={"type": "warning", "message": f"Section issue: {str(e)}"}
-            )
+
+        # Keep streaming deferred images until every render has landed
+        if render_tasks:
+            all_renders = asyncio.ensure_future(asyncio.gather(*render_tasks))
+            async for event in drain_events_until(all_renders, section_events):
+                yield PipelineResult(progress_message=event)
+            images.extend(image for image in all_renders.result() if image)
+    finally:
+        # Stop outstanding sections and renders if the consumer goes away early
+        for task in tasks + render_tasks:
+            task.cancel()
+
+    if is_delta:
+        yield PipelineResult(
+            progress_message={
+                "type": "page_complete",
+                "content": render_scaffold(
+                    f'<style id="component-styles">{" ".join(cleaned_styles)}</style>',
+                    "\n".join(cumulative_markups),
+                ),
+            }
+        )
 
     yield PipelineResult(result=images)
 
 async def process_section(
     section: Dict[str, Any],
-    styles: List[str],
+    global_css: str,
     pipeline_logger: logging.Logger,
+    db=None,
+    image_events: Optional[asyncio.Queue] = None,
+    partials: Optional['SectionPartials'] = None,
 ) -> Dict[str, Any]:
     """Process an individual section."""
     try:
+        if image_events is not None:
+            return await process_section_deferred(section, global_css, db, image_events, partials)
+
         # Generate images and styles concurrently
-        image_task = generate_section_image_details(section.get('image_requirements', []))
+        image_task = generate_section_image_details(section.get('image_requirements', []), db)
         style_task = generate_section_style(
             section.get('css_style_and_animation_instructions', ''),
-            styles[-1] if styles else '',
+            global_css,
         )
 
         section_images, section_style = await asyncio.gather(image_task, style_task)
 
         images = section_images if section_images else []
 
-        append_style(styles, section['name'], section_style['css_rules'], section_style['transitions'])
-
         # Build section structure
         markup = await build_page_section(
             layout_structure=section['layout_structure'],
             section_style=section_style,
             image_details=section_images,
+            partials=partials,
         )
         return {
             'markup': markup,
-            'images': images
+            'images': images,
+            'style': section_style,
         }
     except Exception as e:
         pipeline_logger.error(f"Section '{section['name']}' failed: {str(e)}", exc_info=True)
         raise e
 
+async def process_section_deferred(
+    section: Dict[str, Any],
+    global_css: str,
+    db,
+    image_events: asyncio.Queue,
+    partials: Optional['SectionPartials'] = None,
+) -> Dict[str, Any]:
+    """Build markup against reserved image paths and leave the renders running in the background."""
+    plan_task = plan_section_images(section.get('image_requirements', []), image_generator, db)
+    style_task = generate_section_style(
+        section.get('css_style_and_animation_instructions', ''),
+        global_css,
+    )
+    planned_images, section_style = await asyncio.gather(plan_task, style_task)
+
+    pending_images = [image for image in planned_images if image.get('pending')]
+    if partials is not None:
+        partials.pending_images = [image['path'] for image in pending_images]
+    render_tasks = [
+        asyncio.create_task(render_deferred_image(image_generator, image, image_events))
+        for image in pending_images
+    ]
+
+    try:
+        markup = await build_page_section(
+            layout_structure=section['layout_structure'],
+            section_style=section_style,
+            image_details=[
+                {key: image[key] for key in ('path', 'alt', 'prompt', 'image_name')}
+                for image in planned_images
+            ],
+            partials=partials,
+        )
+    except BaseException:
+        for task in render_tasks:
+            task.cancel()
+        raise
+    return {
+        'markup': markup,
+        'images': [image for image in planned_images if not image.get('pending')],
+        'style': section_style,
+        'render_tasks': render_tasks,
+        'pending_images': [image['path'] for image in pending_images],
+    }
+
+class SectionPartials:
+    """Cleans a section's streamed markup and queues it as throttled section_partial events."""
+
+    def __init__(self, events: asyncio.Queue, index: int, name: str, interval: float = SECTION_PARTIAL_INTERVAL):
+        self.events = events
+        self.index = index
+        self.name = name
+        self.interval = interval
+        self.cleaner = MarkupStreamCleaner()
+        self.pending = ''
+        self.reset = False
+        # Reserved paths not rendered yet, so the preview shows placeholders in the draft
+        self.pending_images: List[str] = []
+        self.sent = False
+        self.last_sent_at = 0.0
+
+    async def feed(self, text: str, first: bool) -> None:
+        if first and (self.sent or self.pending):
+            # A retried call starts the markup over
+            self.cleaner = MarkupStreamCleaner()
+            self.pending = ''
+            self.reset = self.sent
+        self.pending += self.cleaner.feed(text)
+        if time.monotonic() - self.last_sent_at >= self.interval:
+            await self._send()
+
+    async def close(self) -> None:
+        self.pending += self.cleaner.flush()
+        await self._send()
+
+    async def _send(self) -> None:
+        if not self.pending and not self.reset:
+            return
+        await self.events.put({
+            "type": "section_partial",
+            "index": self.index,
+            "name": self.name,
+            "markup": self.pending,
+            "reset": self.reset,
+            "pending_images": self.pending_images,
+        })
+        self.pending = ''
+        self.reset = False
+        self.sent = True
+        self.last_sent_at = time.monotonic()
+
 def append_style(styles_list: List[str], section_name: str, css_rules: str, transitions: str) -> None:
     styles_list.append(f"""
     /* {section_name} */
@@ -222,7 +492,7 @@ async def generate_section_style(
     global_css: str,
 ) -> Dict[str, str]:
     try:
-        with context(lm=lm): 
+        with span('section_style'), context(lm=lm):
             style_response = await execute_llm_call(
                 Predict(Sigs.SectionStyle),
                 style_instructions=style_instructions,
@@ -235,33 +505,41 @@ async def generate_section_style(
     except Exception as e:
         raise Exception(f"Error generating section styles: {str(e)}") from e
 
-async def generate_section_image_details(image_instructions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+async def generate_section_image_details(
+    image_instructions: List[Dict[str, Any]],
+    db=None,
+) -> List[Dict[str, Any]]:
     if not image_instructions:
         return []
 
     try:
-        with context(lm=strong_lm):
+        with span('image_details'), context(lm=strong_lm):
             image_response = await execute_llm_call(
                 ChainOfThought(Sigs.SectionImageDetails),
                 image_instructions=image_instructions,
             )
 
         detailed_images = []
-        image_generator = ImageGenerator(ssh_manager)
-        loop = asyncio.get_running_loop()
-
-        image_tasks = []
-        for image in image_response.image_details:
-            image_name = image['image_name']
-
-            image_tasks.append(loop.run_in_executor(
-                None,
+        categories = await categorize_images(image_response.image_details, image_generator.lm)
+
+        async def resolve_image(image: Dict[str, Any], category: str) -> List[Dict[str, Any]]:
+            # Reuse an earlier render of the same prompt and model when its file is still present
+            if db is not None:
+                cached_image = await find_cached_image(db, image["prompt"])
+                if cached_image and image_generator.has_image(cached_image['path']):
+                    return [cached_image]
+            return await image_scheduler.submit(
+                IMAGE_MODEL,
                 image_generator.generate_image,
                 image["prompt"],
-                image_name,
-            ))
+                image['image_name'],
+                category=category,
+            )
 
-        image_lists = await asyncio.gather(*image_tasks)
+        image_lists = await asyncio.gather(*(
+            resolve_image(image, category)
+            for image, category in zip(image_response.image_details, categories)
+        ))
 
         for image_list, image in zip(image_lists, image_response.image_details):
             if image_list:
@@ -276,19 +554,107 @@ async def generate_section_image_details(image_instructions: List[Dict[str, Any]
     except Exception as e:
         raise Exception(f"Error generating image details: {str(e)}") from e
 
+async def plan_section_images(
+    image_instructions: List[Dict[str, Any]],
+    image_generator: ImageGenerator,
+    db=None,
+) -> List[Dict[str, Any]]:
+    """Names, alt text and paths for a section's images; cached renders are resolved, the rest reserved."""
+    if not image_instructions:
+        return []
+
+    try:
+        with span('image_details'), context(lm=strong_lm):
+            image_response = await execute_llm_call(
+                ChainOfThought(Sigs.SectionImageDetails),
+                image_instructions=image_instructions,
+            )
+
+        planned_images = []
+        categories = await categorize_images(image_response.image_details, image_generator.lm)
+        for image, category in zip(image_response.image_details, categories):
+            details = {
+                'alt': image['alt'],
+                'prompt': image['prompt'],
+                'image_name': image['image_name'],
+            }
+            cached_image = await find_cached_image(db, image['prompt']) if db is not None else None
+            if cached_image and image_generator.has_image(cached_image['path']):
+                planned_images.append({**cached_image, **details})
+            else:
+                planned_images.append({
+                    **details,
+                    'path': image_generator.reserve_path(image['image_name'], category),
+                    'category': category,
+                    'pending': True,
+                })
+        return planned_images
+    except Exception as e:
+        raise Exception(f"Error planning section images: {str(e)}") from e
+
+async def render_deferred_image(
+    image_generator: ImageGenerator,
+    image: Dict[str, Any],
+    image_events: asyncio.Queue,
+) -> Optional[Dict[str, Any]]:
+    """Render an image into its reserved path and announce it on the event queue."""
+    try:
+        image_list = await image_scheduler.submit(
+            IMAGE_MODEL,
+            image_generator.generate_image,
+            image['prompt'],
+            image['image_name'],
+            image['path'],
+            category=image.get('category'),
+        )
+        if not image_list:
+            raise ValueError("No image was returned")
+        rendered = {
+            **image_list[0],
+            'alt': image['alt'],
+            'prompt': image['prompt'],
+            'image_name': image['image_name'],
+        }
+        await image_events.put({
+            "type": "image_ready",
+            "path": image['path'],
+            "url": f"{image['path']}?v={rendered['sha256'][:12]}",
+        })
+        return rendered
+    except Exception as e:
+        logger.error(f"Deferred image '{image['image_name']}' failed: {str(e)}", exc_info=True)
+        await image_events.put({
+            "type": "warning",
+            "message": f"Image issue: {image['image_name']}: {str(e)}",
+        })
+        return None
+
 async def build_page_section(
     layout_structure: str,
     section_style: Dict[str, str],
     image_details: Optional[List[Dict[str, Any]]] = None,
+    partials: Optional['SectionPartials'] = None,
 ) -> str:
     try:
-        with context(lm=strong_lm):
+        if partials is not None:
+            structure = StreamingPredict(
+                Sigs.ComponentStructure,
+                'markup',
+                partials.feed,
+                lm=strong_lm,
+                chain_of_thought=True,
+            )
+        else:
+            structure = ChainOfThought(Sigs.ComponentStructure)
+        with span('section_structure', streamed=partials is not None), context(lm=strong_lm):
             structure_response = await execute_llm_call(
-                ChainOfThought(Sigs.ComponentStructure),
+                structure,
                 layout_structure=layout_structure,
                 section_css_rules=section_style['css_rules'],
                 image_details=image_details,
             )
+        if partials is not None:
+            await partials.close()
 
         # Combine the markup with accessibility features
         cleaned_markup = clean_markup(structure_response.markup)
@@ -298,11 +664,13 @@ async def build_page_section(
         raise Exception(f"Error building section structure: {str(e)}") from e
 
 async def save_images_to_db(images: List[Dict[str, Any]], db) -> None:
-    if images:
+    # Images served from the prompt cache are already recorded
+    new_images = [image for image in images if not image.get('cached')]
+    if new_images:
         current_time = datetime.now(timezone.utc)
         image_documents = [
             {**image, "created_at": current_time}
-            for image in images
+            for image in new_images
         ]
 
         collection = db.get_collection('generated_images')
@@ -40,7 +40,8 @@ class PageBuilderSignatures:
             "image_name",
             "alt",
             "prompt",
-        ], str]] = OutputField(desc='prompt should be detailed and verbose, avoid Icons') 
+            "category",
+        ], str]] = OutputField(desc='prompt should be detailed and verbose, avoid Icons; category is a one or two word gallery folder such as Landscapes, Food or Technology') 
     class SectionStyle(Signature):
         """Define section styles with awareness of global context"""
         style_instructions = InputField()
@@ -0,0 +1,238 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from backend.utils.user_cache import user_cache
+
+logger = logging.getLogger('app.rate_limits')
+
+@dataclass(frozen=True)
+class PlanLimits:
+    """Build limits for one plan; a None limit disables that check."""
+    lifetime_requests: Optional[int] = None
+    window_requests: Optional[int] = None
+    window_seconds: int = 86400
+    burst: Optional[int] = None
+    refill_per_second: float = 0.0
+
+def _env_limit(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return int(value) if value else None
+
+PLANS: Dict[str, PlanLimits] = {
+    'free': PlanLimits(
+        lifetime_requests=_env_limit('FREE_PLAN_LIFETIME_REQUESTS', 10),
+        window_requests=_env_limit('FREE_PLAN_WINDOW_REQUESTS', None),
+        burst=2,
+        refill_per_second=1 / 60,
+    ),
+    'pro': PlanLimits(
+        window_requests=_env_limit('PRO_PLAN_WINDOW_REQUESTS', 100),
+        burst=5,
+        refill_per_second=1 / 10,
+    ),
+    'unlimited': PlanLimits(),
+}
+DEFAULT_PLAN = os.getenv('DEFAULT_PLAN', 'free')
+
+@dataclass
+class QuotaDecision:
+    allowed: bool
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    retry_after: Optional[float] = None
+    message: str = ''
+    receipt: Dict[str, Any] = field(default_factory=dict)
+
+class TokenBucketLimiter:
+    """Per-worker token bucket per user, smoothing bursts of submissions."""
+    name = 'burst'
+    counts_quota = False
+
+    def __init__(self, max_users: int = 10000, idle_after: float = 3600):
+        self.max_users = max_users
+        self.idle_after = idle_after
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _tokens(self, user_id: str, plan: PlanLimits, now: float) -> float:
+        tokens, updated_at = self._buckets.get(user_id, (plan.burst, now))
+        return min(plan.burst, tokens + (now - updated_at) * plan.refill_per_second)
+
+    async def acquire(self, db, user_id: str, plan: PlanLimits) -> QuotaDecision:
+        if plan.burst is None:
+            return QuotaDecision(True)
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(user_id, plan, now)
+            if tokens < 1:
+                self._buckets[user_id] = (tokens, now)
+                retry_after = (1 - tokens) / plan.refill_per_second if plan.refill_per_second else None
+                return QuotaDecision(
+                    False,
+                    limit=plan.burst,
+                    remaining=0,
+                    retry_after=retry_after,
+                    message="Too many builds started at once, please wait a moment",
+                )
+            if len(self._buckets) >= self.max_users and user_id not in self._buckets:
+                # Buckets idle this long have refilled and carry no state worth keeping
+                self._buckets = {
+                    key: value for key, value in self._buckets.items()
+                    if now - value[1] < self.idle_after
+                }
+            self._buckets[user_id] = (tokens - 1, now)
+        return QuotaDecision(True, limit=plan.burst, remaining=int(tokens - 1))
+
+    async def refund(self, db, user_id: str, plan: PlanLimits, receipt: Dict[str, Any]) -> None:
+        if plan.burst is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if user_id in self._buckets:
+                self._buckets[user_id] = (min(plan.burst, self._tokens(user_id, plan, now) + 1), now)
+
+class WindowedQuota:
+    """Fixed-window build counter in the api_usage collection, one document per user and window."""
+    name = 'window'
+    counts_quota = True
+
+    def __init__(self, collection_name: str = 'api_usage'):
+        self.collection_name = collection_name
+
+    async def acquire(self, db, user_id: str, plan: PlanLimits) -> QuotaDecision:
+        if plan.window_requests is None:
+            return QuotaDecision(True)
+        collection = db.get_collection(self.collection_name)
+        window_start = int(time.time() // plan.window_seconds) * plan.window_seconds
+        window_end = window_start + plan.window_seconds
+        key = f"{user_id}:{plan.window_seconds}:{window_start}"
+        try:
+            # A full window fails the $lt guard, and the upsert then collides on _id
+            usage = await collection.find_one_and_update(
+                {'_id': key, 'count': {'$lt': plan.window_requests}},
+                {
+                    '$inc': {'count': 1},
+                    '$setOnInsert': {
+                        'user_id': user_id,
+                        'expires_at': datetime.fromtimestamp(window_end, timezone.utc),
+                    },
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return QuotaDecision(
+                False,
+                limit=plan.window_requests,
+                remaining=0,
+                retry_after=window_end - time.time(),
+                message=f"You have reached your limit of {plan.window_requests} builds for this period",
+            )
+        return QuotaDecision(
+            True,
+            limit=plan.window_requests,
+            remaining=plan.window_requests - usage['count'],
+            receipt={'window_key': key},
+        )
+
+    async def refund(self, db, user_id: str, plan: PlanLimits, receipt: Dict[str, Any]) -> None:
+        key = receipt.get('window_key')
+        if key:
+            await db.get_collection(self.collection_name).update_one(
+                {'_id': key, 'count': {'$gt': 0}},
+                {'$inc': {'count': -1}},
+            )
+
+class LifetimeQuota:
+    """Total builds per user, kept in users.api_request_count and charged with one guarded update."""
+    name = 'lifetime'
+    counts_quota = True
+
+    async def acquire(self, db, user_id: str, plan: PlanLimits) -> QuotaDecision:
+        if plan.lifetime_requests is None:
+            return QuotaDecision(True)
+        user = await db.users.find_one_and_update(
+            {
+                '_id': ObjectId(user_id),
+                '$or': [
+                    {'api_request_count': {'$lt': plan.lifetime_requests}},
+                    {'api_request_count': {'$exists': False}},
+                ],
+            },
+            {'$inc': {'api_request_count': 1}},
+            projection={'api_request_count': 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if user is None:
+            return QuotaDecision(
+                False,
+                limit=plan.lifetime_requests,
+                remaining=0,
+                message="You have reached your API request limit",
+            )
+        return QuotaDecision(
+            True,
+            limit=plan.lifetime_requests,
+            remaining=plan.lifetime_requests - user['api_request_count'],
+        )
+
+    async def refund(self, db, user_id: str, plan: PlanLimits, receipt: Dict[str, Any]) -> None:
+        await db.users.update_one(
+            {'_id': ObjectId(user_id), 'api_request_count': {'$gt': 0}},
+            {'$inc': {'api_request_count': -1}},
+        )
+
+class RateLimiter:
+    """
+    Runs a user's plan through each limiter in order. A denial rolls back the limiters that
+    already charged, and the receipt of a granted request lets refund() undo it later.
+    """
+
+    def __init__(self, limiters: List[Any], plans: Dict[str, PlanLimits] = None, default_plan: str = DEFAULT_PLAN):
+        self.limiters = limiters
+        self.plans = plans or PLANS
+        self.default_plan = default_plan
+
+    def plan_name(self, user) -> str:
+        plan = getattr(user, 'plan', None)
+        return plan if plan in self.plans else self.default_plan
+
+    async def acquire(self, db, user) -> QuotaDecision:
+        plan_name = self.plan_name(user)
+        plan = self.plans[plan_name]
+        receipt = {'plan': plan_name, 'limiters': []}
+        quota = QuotaDecision(True)
+        for limiter in self.limiters:
+            decision = await limiter.acquire(db, user.user_id, plan)
+            if not decision.allowed:
+                await self.refund(db, user.user_id, receipt)
+                logger.info(f"Build for user {user.user_id} denied by {limiter.name} limit")
+                return decision
+            receipt['limiters'].append(limiter.name)
+            receipt.update(decision.receipt)
+            if limiter.counts_quota and decision.remaining is not None:
+                if quota.remaining is None or decision.remaining < quota.remaining:
+                    quota = decision
+        return QuotaDecision(True, limit=quota.limit, remaining=quota.remaining, receipt=receipt)
+
+    async def refund(self, db, user_id: str, receipt: Dict[str, Any]) -> None:
+        plan = self.plans.get(receipt.get('plan'), self.plans[self.default_plan])
+        for limiter in reversed(self.limiters):
+            if limiter.name in receipt.get('limiters', []):
+                try:
+                    await limiter.refund(db, user_id, plan, receipt)
+                except Exception as e:
+                    logger.error(f"Failed to refund {limiter.name} quota for user {user_id}: {str(e)}")
+        # The lifetime refund changes users.api_request_count, which the user cache holds
+        user_cache.invalidate_user_id(user_id)
+
+rate_limiter = RateLimiter([TokenBucketLimiter(), WindowedQuota(), LifetimeQuota()])
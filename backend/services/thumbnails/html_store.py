@@ -0,0 +1,170 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from bson import Binary
+from backend.utils.memory_cache import MemoryCacheTier
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('app.thumbnail_html')
+
+# Frozen copies of the scaffold's asset tags, replaced by placeholders before compression.
+# Add a new set when COMPONENT_SCAFFOLD changes; never edit one that blobs may reference.
+SCAFFOLD_ASSET_SETS: Dict[int, tuple] = {
+    1: (
+        '<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js" integrity="sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz" crossorigin="anonymous"></script>',
+        '<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet" integrity="sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH" crossorigin="anonymous">',
+        '<link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
+    ),
+}
+CURRENT_ASSET_SET = 1
+
+# NUL never appears in serialized HTML, so placeholders cannot collide with page content
+def _placeholder(index: int) -> str:
+    return f"\x00{index}\x00"
+
+def factor_scaffold(html: str, asset_set: int = CURRENT_ASSET_SET) -> tuple[str, Optional[int]]:
+    """Swap known scaffold tags for placeholders; returns the HTML unchanged and None when that is not safe."""
+    if '\x00' in html:
+        return html, None
+    factored = html
+    for index, tag in enumerate(SCAFFOLD_ASSET_SETS[asset_set]):
+        factored = factored.replace(tag, _placeholder(index))
+    if factored == html:
+        return html, None
+    return factored, asset_set
+
+def restore_scaffold(html: str, asset_set: Optional[int]) -> str:
+    if asset_set is None:
+        return html
+    for index, tag in enumerate(SCAFFOLD_ASSET_SETS[asset_set]):
+        html = html.replace(_placeholder(index), tag)
+    return html
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def default_codec() -> str:
+    codec = os.getenv('THUMBNAIL_HTML_CODEC', 'zstd' if zstandard else 'gzip')
+    if codec == 'zstd' and zstandard is None:
+        logger.warning("THUMBNAIL_HTML_CODEC=zstd but zstandard is not installed, using gzip")
+        return 'gzip'
+    return codec
+
+def html_sha256(html: str) -> str:
+    return hashlib.sha256(html.encode()).hexdigest()
+
+def etag_for(sha256: str) -> str:
+    return f'"{sha256[:32]}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists etag; weak tags compare equal to strong ones."""
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag.strip('"'):
+            return True
+    return False
+
+class ThumbnailHtmlStore:
+    """
+    Saved page HTML, compressed and stored once per content hash in thumbnail_blobs with a
+    reference count. Thumbnails point at their blob through html_sha256. Each blob also keeps
+    a gzip of the full document that gzip-accepting clients are served without recompressing.
+    """
+
+    def __init__(self, db, codec: str = None, gzip_cache_entries: int = None):
+        self.blobs = db.get_collection('thumbnail_blobs')
+        self.codec = codec or default_codec()
+        # gzip of the rebuilt documents, served as-is to clients that accept gzip
+        self.gzip_cache = MemoryCacheTier(
+            max_entries=gzip_cache_entries or int(os.getenv('THUMBNAIL_GZIP_CACHE_ENTRIES', '256')),
+            ttl=3600,
+        )
+
+    def _encode(self, html: str) -> dict:
+        factored, asset_set = factor_scaffold(html)
+        raw = factored.encode()
+        return {
+            'codec': self.codec,
+            'asset_set': asset_set,
+            'data': Binary(compress(raw, self.codec)),
+            'gzip': Binary(gzip.compress(html.encode(), compresslevel=9)),
+            'size': len(html.encode()),
+        }
+
+    async def put(self, html: str) -> str:
+        """Store html, sharing the blob with identical pages; returns its SHA-256."""
+        sha256 = html_sha256(html)
+        existing = await self.blobs.find_one_and_update({'_id': sha256}, {'$inc': {'refcount': 1}}, projection={'_id': 1})
+        if existing:
+            return sha256
+
+        blob = await asyncio.to_thread(self._encode, html)
+        await self.blobs.update_one(
+            {'_id': sha256},
+            {
+                '$setOnInsert': {**blob, 'created_at': datetime.now(timezone.utc)},
+                '$inc': {'refcount': 1},
+            },
+            upsert=True,
+        )
+        logger.debug(
+            f"Stored thumbnail HTML {sha256[:12]}: {blob['size']} -> {len(blob['data'])} bytes "
+            f"({len(blob['gzip'])} gzip)"
+        )
+        return sha256
+
+    async def release(self, sha256: str) -> None:
+        """Drop one reference and delete the blob once nothing points at it."""
+        await self.blobs.update_one({'_id': sha256}, {'$inc': {'refcount': -1}})
+        await self.blobs.delete_one({'_id': sha256, 'refcount': {'$lte': 0}})
+
+    def _decode(self, blob: dict) -> str:
+        factored = decompress(bytes(blob['data']), blob['codec']).decode()
+        return restore_scaffold(factored, blob.get('asset_set'))
+
+    async def get_html(self, sha256: str) -> Optional[str]:
+        blob = await self.blobs.find_one({'_id': sha256}, {'gzip': 0})
+        if blob is None:
+            return None
+        return await asyncio.to_thread(self._decode, blob)
+
+    async def get_gzip(self, sha256: str) -> Optional[bytes]:
+        """Gzip-encoded document for Content-Encoding: gzip responses."""
+        cached = self.gzip_cache.get(sha256)
+        if cached is not None:
+            return cached
+        blob = await self.blobs.find_one({'_id': sha256}, {'data': 0})
+        if blob is None:
+            return None
+        if blob.get('gzip') is not None:
+            encoded = bytes(blob['gzip'])
+        else:
+            # Blob stored before gzip renderings were kept; build one and save it for next time
+            blob = await self.blobs.find_one({'_id': sha256})
+            if blob is None:
+                return None
+            html = await asyncio.to_thread(self._decode, blob)
+            encoded = await asyncio.to_thread(gzip.compress, html.encode(), 9)
+            await self.blobs.update_one({'_id': sha256}, {'$set': {'gzip': Binary(encoded)}})
+        self.gzip_cache.set(sha256, encoded)
+        return encoded
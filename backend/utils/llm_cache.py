@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+from dspy import Prediction, settings
+from backend.utils.memory_cache import MemoryCacheTier
+
+logger = logging.getLogger('app.llm_cache')
+
+CACHE_KEY_VERSION = 1
+
+def _normalize_value(value: Any) -> Any:
+    """Normalize inputs so near-identical prompts map to the same key."""
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+def _find_signature(func: Callable) -> Any:
+    signature = getattr(func, 'signature', None)
+    if signature is None:
+        signature = getattr(getattr(func, 'predict', None), 'signature', None)
+    return signature
+
+def signature_name(func: Callable) -> str:
+    return getattr(_find_signature(func), '__name__', None) or type(func).__name__
+
+def _describe_signature(func: Callable) -> Optional[str]:
+    signature = _find_signature(func)
+    if signature is None:
+        return None
+    return json.dumps({
+        'module': type(func).__name__,
+        'name': getattr(signature, '__name__', str(signature)),
+        'fields': getattr(signature, 'signature', ''),
+        'instructions': getattr(signature, 'instructions', ''),
+    }, sort_keys=True)
+
+def build_cache_key(func: Callable, args: tuple, kwargs: Dict[str, Any], lm: Any = None) -> Optional[str]:
+    """Stable hash of the signature, the active model and the normalized inputs."""
+    signature = _describe_signature(func)
+    lm = lm if lm is not None else settings.lm
+    if signature is None or lm is None or args:
+        return None
+    try:
+        payload = json.dumps({
+            'v': CACHE_KEY_VERSION,
+            'signature': signature,
+            'model': getattr(lm, 'model', str(lm)),
+            'inputs': _normalize_value(kwargs),
+        }, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def serialize_prediction(prediction: Any) -> Optional[str]:
+    if not isinstance(prediction, Prediction):
+        return None
+    try:
+        return json.dumps(prediction.toDict())
+    except (TypeError, ValueError):
+        return None
+
+def deserialize_prediction(payload: str) -> Prediction:
+    return Prediction(**json.loads(payload))
+
+class DiskCacheTier:
+    """Shared tier storing one JSON file per key, evicting oldest files past max_entries."""
+
+    def __init__(self, directory: str, max_entries: int = 10000, ttl: float = 86400):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, payload: str) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(payload)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        overflow = len(entries) - self.max_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:overflow]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, payload: str) -> None:
+        await asyncio.to_thread(self._write, key, payload)
+
+class MongoCacheTier:
+    """Shared tier backed by a MongoDB collection with a TTL index on expires_at."""
+
+    def __init__(self, collection, max_entries: int = 50000, ttl: float = 86400):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes_since_trim = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        document = await self.collection.find_one(
+            {'_id': key, 'expires_at': {'$gt': datetime.now(timezone.utc)}},
+            {'payload': 1},
+        )
+        return document['payload'] if document else None
+
+    async def set(self, key: str, payload: str) -> None:
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {'_id': key},
+            {'$set': {
+                'payload': payload,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=self.ttl),
+            }},
+            upsert=True,
+        )
+        self._writes_since_trim += 1
+        if self._writes_since_trim >= 100:
+            self._writes_since_trim = 0
+            await self._trim()
+
+    async def _trim(self) -> None:
+        overflow = await self.collection.estimated_document_count() - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = await self.collection.find({}, {'_id': 1}).sort('created_at', 1).limit(overflow).to_list(length=overflow)
+        await self.collection.delete_many({'_id': {'$in': [doc['_id'] for doc in oldest]}})
+
+class LLMResponseCache:
+    """Two-tier response cache used by execute_llm_call."""
+
+    def __init__(self, memory_tier: Optional[MemoryCacheTier] = None, shared_tier=None, enabled: bool = True):
+        self.memory_tier = memory_tier or MemoryCacheTier()
+        self.shared_tier = shared_tier
+        self.enabled = enabled
+        self.stats = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+
+    def build_key(self, func: Callable, args: tuple, kwargs: Dict[str, Any], lm: Any = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return build_cache_key(func, args, kwargs, lm)
+
+    async def get(self, key: str) -> Optional[Prediction]:
+        payload = self.memory_tier.get(key)
+        if payload is not None:
+            self.stats['memory_hits'] += 1
+            return deserialize_prediction(payload)
+
+        if self.shared_tier is not None:
+            try:
+                payload = await self.shared_tier.get(key)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Shared LLM cache read failed: {str(e)}")
+                payload = None
+            if payload is not None:
+                self.stats['shared_hits'] += 1
+                self.memory_tier.set(key, payload)
+                return deserialize_prediction(payload)
+
+        self.stats['misses'] += 1
+        return None
+
+    async def set(self, key: str, prediction: Any) -> None:
+        payload = serialize_prediction(prediction)
+        if payload is None:
+            return
+        self.memory_tier.set(key, payload)
+        self.stats['writes'] += 1
+        if self.shared_tier is not None:
+            try:
+                await self.shared_tier.set(key, payload)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Shared LLM cache write failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['memory_hits'] + self.stats['shared_hits'] + self.stats['misses']
+        hits = lookups - self.stats['misses']
+        return {
+            **self.stats,
+            'memory_entries': len(self.memory_tier),
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+def create_llm_cache() -> LLMResponseCache:
+    """Build the cache from LLM_CACHE_* environment variables."""
+    ttl = float(os.getenv('LLM_CACHE_TTL', '86400'))
+    memory_tier = MemoryCacheTier(
+        max_entries=int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '512')),
+        ttl=ttl,
+    )
+    shared_tier = None
+    if os.getenv('LLM_CACHE_BACKEND') == 'disk':
+        shared_tier = DiskCacheTier(
+            os.getenv('LLM_CACHE_DIR', os.path.join('.cache', 'llm')),
+            max_entries=int(os.getenv('LLM_CACHE_SHARED_ENTRIES', '10000')),
+            ttl=ttl,
+        )
+    return LLMResponseCache(
+        memory_tier=memory_tier,
+        shared_tier=shared_tier,
+        enabled=os.getenv('LLM_CACHE_ENABLED', 'true') == 'true',
+    )
+
+def attach_mongo_tier(cache: LLMResponseCache, db) -> None:
+    """Use MongoDB as the shared tier when LLM_CACHE_BACKEND=mongo."""
+    if os.getenv('LLM_CACHE_BACKEND') != 'mongo':
+        return
+    cache.shared_tier = MongoCacheTier(
+        db.get_collection('llm_cache'),
+        max_entries=int(os.getenv('LLM_CACHE_SHARED_ENTRIES', '50000')),
+        ttl=cache.memory_tier.ttl,
+    )
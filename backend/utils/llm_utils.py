@@ -1,11 +1,22 @@
 import asyncio
+import contextvars
+import copy
 import logging
 import os
-from typing import Callable, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Any, Dict, Optional
+import litellm
 from dotenv import load_dotenv
 from litellm.exceptions import InternalServerError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from dspy import LM, configure
+from dspy import LM, OutputField, Prediction, configure, context, settings
+from dspy.adapters import ChatAdapter
+from backend.utils.llm_cache import build_cache_key, create_llm_cache, deserialize_prediction, serialize_prediction, signature_name
+from backend.utils.replay import CassetteMiss, cassette
+from backend.utils.tracing import current_span, span
 
 # Configure logging
 logger = logging.getLogger('app.llm_utils')
@@ -21,6 +32,86 @@ MODEL_DICT = {
     '4o': {'model': 'openai/gpt-4o', 'max_tokens': 4096},
 }
 
+# Response cache shared by every execute_llm_call in this worker
+llm_cache = create_llm_cache()
+
+# Dedicated pool for synchronous dspy predictors so they never block the event loop
+LLM_THREAD_POOL_SIZE = int(os.getenv('LLM_THREAD_POOL_SIZE', '16'))
+llm_executor = ThreadPoolExecutor(max_workers=LLM_THREAD_POOL_SIZE, thread_name_prefix='llm')
+_pool_lock = threading.Lock()
+_pool_stats = {'active': 0, 'queued': 0, 'completed': 0, 'peak_queued': 0, 'total_wait_seconds': 0.0}
+
+def get_llm_pool_stats() -> Dict[str, Any]:
+    """Snapshot of LLM thread pool utilisation; saturated when active == max_workers and queued > 0."""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    stats['max_workers'] = LLM_THREAD_POOL_SIZE
+    stats['saturation'] = stats['active'] / LLM_THREAD_POOL_SIZE
+    return stats
+
+def _record_usage(history: list) -> None:
+    """Add token counts and cost from a call's LM history to the current span."""
+    llm_span = current_span()
+    if llm_span is None:
+        return
+    for entry in history:
+        usage = entry.get('usage') or {}
+        llm_span.add('prompt_tokens', usage.get('prompt_tokens', 0) or 0)
+        llm_span.add('completion_tokens', usage.get('completion_tokens', 0) or 0)
+        llm_span.add('cost_usd', entry.get('cost') or 0)
+        llm_span.add('lm_requests', 1)
+
+def _run_with_lm(ticket: Dict[str, str], lm: Any, submitted_at: float, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    queue_wait = time.monotonic() - submitted_at
+    with _pool_lock:
+        if ticket['state'] == 'abandoned':
+            # The caller was cancelled while this call waited; its queue slot is already released
+            return None
+        ticket['state'] = 'running'
+        _pool_stats['queued'] -= 1
+        _pool_stats['active'] += 1
+        _pool_stats['total_wait_seconds'] += queue_wait
+    llm_span = current_span()
+    if llm_span is not None:
+        llm_span.add('queue_wait_seconds', queue_wait)
+    try:
+        if lm is None:
+            return func(*args, **kwargs)
+        # A shallow copy gives this call its own history, so usage is not mixed with concurrent calls
+        call_lm = copy.copy(lm)
+        call_lm.history = []
+        try:
+            # dspy settings are per thread, so re-bind the caller's LM inside the worker
+            with context(lm=call_lm):
+                return func(*args, **kwargs)
+        finally:
+            _record_usage(call_lm.history)
+    finally:
+        with _pool_lock:
+            _pool_stats['active'] -= 1
+            _pool_stats['completed'] += 1
+
+async def run_in_llm_pool(lm: Any, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a synchronous predictor on the LLM pool with the given LM bound."""
+    with _pool_lock:
+        _pool_stats['queued'] += 1
+        _pool_stats['peak_queued'] = max(_pool_stats['peak_queued'], _pool_stats['queued'])
+        saturated = _pool_stats['active'] + _pool_stats['queued'] > LLM_THREAD_POOL_SIZE
+    if saturated:
+        logger.warning(f"LLM thread pool saturated ({LLM_THREAD_POOL_SIZE} workers busy), call is queued")
+    ticket = {'state': 'queued'}
+    ctx = contextvars.copy_context()
+    call = partial(_run_with_lm, ticket, lm, time.monotonic(), func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(llm_executor, ctx.run, call)
+    finally:
+        # A cancelled call never reaches the worker, so release its queue slot here
+        with _pool_lock:
+            if ticket['state'] == 'queued':
+                ticket['state'] = 'abandoned'
+                _pool_stats['queued'] -= 1
+
 # Initialize LLM configurations
 def initialize_llm(lm, strong_lm):
     logger.info(f"Initializing LLM with {lm} and {strong_lm}")
@@ -36,23 +127,155 @@ def initialize_llm(lm, strong_lm):
     
     return lm_instance, strong_lm_instance
 
+async def execute_llm_call(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Execute an LLM call, serving repeated signature/model/input combinations from the response cache.
+    With PIPELINE_REPLAY_MODE set, calls are recorded to or served from the pipeline cassette.
+    """
+    # Capture the LM bound by the caller's context() before yielding to the event loop
+    lm = settings.lm
+    with span('llm_call', model=getattr(lm, 'model', 'unknown'), signature=signature_name(func)) as llm_span:
+        cache_key = llm_cache.build_key(func, args, kwargs, lm)
+        # Keyed independently of the response cache, which may be disabled
+        cassette_key = build_cache_key(func, args, kwargs, lm) if cassette else None
+        if cassette and cassette.is_replaying:
+            if cassette_key is None:
+                raise CassetteMiss(f"Cannot replay {signature_name(func)}: the call has no cassette key")
+            llm_span.set(replayed=True)
+            return await _replay_llm_call(cassette_key)
+
+        started = time.monotonic()
+        result = None
+        if cache_key:
+            result = await llm_cache.get(cache_key)
+            if result is not None:
+                logger.debug(f"LLM cache hit for {type(func).__name__}")
+                llm_span.set(cache_hit=True)
+
+        if result is None:
+            result = await _call_llm(lm, func, *args, **kwargs)
+            if cache_key:
+                await llm_cache.set(cache_key, result)
+
+        if cassette and cassette.is_recording:
+            if cassette_key is None:
+                logger.warning(f"Not recording {signature_name(func)}: the call has no cassette key")
+            else:
+                _record_llm_call(cassette_key, time.monotonic() - started, result)
+        return result
+
+async def _replay_llm_call(cache_key: str) -> Any:
+    interaction = cassette.lookup('llm', cache_key)
+    delay = cassette.replay_delay(interaction['duration'])
+    if delay:
+        await asyncio.sleep(delay)
+    return deserialize_prediction(interaction['response']['prediction'])
+
+def _record_llm_call(cache_key: str, duration: float, result: Any) -> None:
+    payload = serialize_prediction(result)
+    if payload is None:
+        logger.warning(f"Not recording LLM call {cache_key[:12]}: response is not serializable")
+        return
+    try:
+        cassette.record('llm', cache_key, duration, {'prediction': payload})
+    except Exception as e:
+        logger.warning(f"Failed to record LLM call to cassette: {str(e)}")
+
+def _before_retry_sleep(retry_state) -> None:
+    logger.info(f"Retrying due to overload... attempt {retry_state.attempt_number}")
+    llm_span = current_span()
+    if llm_span is not None:
+        llm_span.add('retries', 1)
+
 @retry(
     retry=retry_if_exception_type(InternalServerError),
     wait=wait_exponential(multiplier=1, min=4, max=10),
     stop=stop_after_attempt(3),
-    before_sleep=lambda retry_state: logger.info(f"Retrying due to overload... attempt {retry_state.attempt_number}")
+    before_sleep=_before_retry_sleep
 )
-async def execute_llm_call(func: Callable, *args: Any, **kwargs: Any) -> Any:
+async def _call_llm(lm: Any, func: Callable, *args: Any, **kwargs: Any) -> Any:
     """
     Execute an LLM call with retry logic for handling rate limits and server overload.
     """
     try:
-        if asyncio.iscoroutinefunction(func):
+        if asyncio.iscoroutinefunction(func) or asyncio.iscoroutinefunction(getattr(func, '__call__', None)):
             return await func(*args, **kwargs)
-        return func(*args, **kwargs)
+        return await run_in_llm_pool(lm, func, *args, **kwargs)
     except InternalServerError as e:
         logger.warning(f"LLM overload error: {str(e)}")
         raise
     except Exception as e:
         logger.error(f"Unexpected error in LLM call: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+class StreamingPredict:
+    """
+    Async stand-in for Predict/ChainOfThought that streams the completion through litellm. Text of
+    stream_field is passed to on_chunk(text, first) as it arrives, first being True at the start of
+    each attempt, and the parsed Prediction is returned. It exposes .signature, so execute_llm_call
+    caches, records and replays it like any other predictor; cache hits produce no chunks.
+    """
+
+    def __init__(
+        self,
+        signature: Any,
+        stream_field: str,
+        on_chunk: Callable[[str, bool], Awaitable[None]],
+        lm: Any = None,
+        chain_of_thought: bool = False,
+    ):
+        if chain_of_thought:
+            signature = signature.prepend(
+                'reasoning',
+                OutputField(prefix="Reasoning: Let's think step by step in order to", desc='${reasoning}'),
+                type_=str,
+            )
+        self.signature = signature
+        self.stream_field = stream_field
+        self.on_chunk = on_chunk
+        # Bound explicitly: other coroutines on this thread may change settings.lm while we stream
+        self.lm = lm
+
+    async def __call__(self, **kwargs: Any) -> Prediction:
+        lm = self.lm or settings.lm
+        adapter = settings.adapter or ChatAdapter()
+        messages = adapter.format(self.signature, [], kwargs)
+        marker = f"[[ ## {self.stream_field} ## ]]"
+        field_end = "[[ ##"
+        chunks = []
+        text = ''
+        # Position in text up to which the field has been forwarded; None until its header arrives
+        forwarded = None
+        field_done = False
+        first = True
+
+        response = await litellm.acompletion(model=lm.model, messages=messages, stream=True, **lm.kwargs)
+        async for chunk in response:
+            chunks.append(chunk)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta or field_done:
+                continue
+            text += delta
+            if forwarded is None:
+                start = text.find(marker)
+                if start < 0:
+                    continue
+                forwarded = start + len(marker)
+            end = text.find(field_end, forwarded)
+            field_done = end >= 0
+            # Hold back a possible partial header of the next field
+            safe = end if field_done else max(forwarded, len(text) - len(field_end) + 1)
+            if safe > forwarded:
+                await self.on_chunk(text[forwarded:safe], first)
+                first = False
+                forwarded = safe
+
+        completion = litellm.stream_chunk_builder(chunks, messages=messages)
+        _record_usage([{'usage': dict(getattr(completion, 'usage', None) or {}), 'cost': self._cost(completion)}])
+        return Prediction(**adapter.parse(self.signature, completion.choices[0].message.content))
+
+    def _cost(self, completion: Any) -> Optional[float]:
+        try:
+            return litellm.completion_cost(completion_response=completion)
+        except Exception:
+            return None
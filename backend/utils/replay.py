@@ -0,0 +1,146 @@
+import atexit
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger('app.replay')
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when the cassette has no response for a request."""
+
+class Cassette:
+    """
+    On-disk recording of LLM and image-generation calls.
+
+    interactions.jsonl holds one JSON record per call and image bytes are stored once per SHA-256
+    under blobs/. index.json maps "kind:key" to the byte offsets of its records; it is written on
+    close and caught up from the end of interactions.jsonl on load, so recording only appends.
+    """
+
+    def __init__(self, directory: str, mode: str, speed: float = 0.0):
+        self.directory = directory
+        self.mode = mode
+        # 0 replays at full speed, 1 with the recorded latency, 0.5 at half of it
+        self.speed = speed
+        self.blob_dir = os.path.join(directory, 'blobs')
+        self.data_path = os.path.join(directory, 'interactions.jsonl')
+        self.index_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._replay_positions: Dict[str, int] = defaultdict(int)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._indexed_size = 0
+        self._index: Dict[str, List[int]] = self._load_index()
+        self._index_dirty = False
+        atexit.register(self.close)
+
+    @property
+    def is_recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def is_replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load_index(self) -> Dict[str, List[int]]:
+        index: Dict[str, List[int]] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                saved = json.load(file)
+            # Indexes without a size predate incremental loading and are rebuilt
+            if 'size' in saved:
+                index = saved['offsets']
+                self._indexed_size = saved['size']
+        if not os.path.exists(self.data_path):
+            return index
+        if os.path.getsize(self.data_path) < self._indexed_size:
+            index, self._indexed_size = {}, 0
+        with open(self.data_path, 'rb') as file:
+            file.seek(self._indexed_size)
+            while True:
+                offset = file.tell()
+                line = file.readline()
+                if not line.endswith(b'\n'):
+                    break
+                entry = json.loads(line)
+                index.setdefault(f"{entry['kind']}:{entry['key']}", []).append(offset)
+                self._indexed_size = file.tell()
+        return index
+
+    def _save_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'size': self._indexed_size, 'offsets': self._index}, file)
+        os.replace(tmp_path, self.index_path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._index_dirty:
+                self._save_index()
+                self._index_dirty = False
+
+    def record(self, kind: str, key: str, duration: float, response: Dict[str, Any]) -> None:
+        line = json.dumps({'kind': kind, 'key': key, 'duration': duration, 'response': response}) + '\n'
+        with self._lock:
+            with open(self.data_path, 'ab') as file:
+                offset = file.tell()
+                file.write(line.encode('utf-8'))
+                self._indexed_size = file.tell()
+            self._index.setdefault(f"{kind}:{key}", []).append(offset)
+            self._index_dirty = True
+
+    def lookup(self, kind: str, key: str) -> Dict[str, Any]:
+        """Next recorded interaction for this request; repeats the last one once exhausted."""
+        index_key = f"{kind}:{key}"
+        with self._lock:
+            offsets = self._index.get(index_key)
+            if not offsets:
+                raise CassetteMiss(f"No recorded {kind} response for key {key}")
+            position = self._replay_positions[index_key]
+            self._replay_positions[index_key] = position + 1
+            offset = offsets[min(position, len(offsets) - 1)]
+            with open(self.data_path, 'rb') as file:
+                file.seek(offset)
+                return json.loads(file.readline())
+
+    def replay_delay(self, duration: float) -> float:
+        return max(0.0, duration * self.speed)
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, f"{sha256}.bin")
+
+    def store_blob(self, sha256: str, source_path: str) -> None:
+        blob_path = self.blob_path(sha256)
+        if os.path.exists(blob_path):
+            return
+        tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, blob_path)
+
+    def iter_blob(self, sha256: str, chunk_size: int = 65536) -> Iterator[bytes]:
+        with open(self.blob_path(sha256), 'rb') as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+def load_cassette() -> Optional[Cassette]:
+    """Cassette configured by PIPELINE_REPLAY_MODE, PIPELINE_CASSETTE_DIR and PIPELINE_REPLAY_SPEED."""
+    mode = os.getenv('PIPELINE_REPLAY_MODE', 'off')
+    if mode not in (RECORD, REPLAY):
+        return None
+    directory = os.getenv('PIPELINE_CASSETTE_DIR', os.path.join('.cache', 'cassettes', 'default'))
+    logger.info(f"Pipeline cassette in {mode} mode at {directory}")
+    return Cassette(directory, mode, speed=float(os.getenv('PIPELINE_REPLAY_SPEED', '0')))
+
+cassette = load_cassette()
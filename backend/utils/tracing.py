@@ -0,0 +1,167 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('app.tracing')
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+@dataclass
+class Span:
+    """A timed pipeline stage; attributes may be filled in by worker threads while it is open."""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    status: str = 'ok'
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+class PrometheusSink:
+    """Aggregates finished spans into Prometheus text-format counters and histograms."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._span_buckets = defaultdict(lambda: [0] * len(self.BUCKETS))
+        self._span_sum = defaultdict(float)
+        self._span_count = defaultdict(int)
+        self._span_errors = defaultdict(int)
+        self._llm_counters = defaultdict(float)
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._span_sum[span.name] += span.duration
+            self._span_count[span.name] += 1
+            if span.status != 'ok':
+                self._span_errors[span.name] += 1
+            buckets = self._span_buckets[span.name]
+            for index, bound in enumerate(self.BUCKETS):
+                if span.duration <= bound:
+                    buckets[index] += 1
+
+            if span.name == 'llm_call':
+                model = span.attributes.get('model', 'unknown')
+                for key in ('prompt_tokens', 'completion_tokens', 'cost_usd', 'retries', 'queue_wait_seconds'):
+                    self._llm_counters[(key, model)] += span.attributes.get(key, 0) or 0
+                if span.attributes.get('cache_hit'):
+                    self._llm_counters[('cache_hits', model)] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            '# TYPE pipeline_span_seconds histogram',
+        ]
+        with self._lock:
+            for name, buckets in self._span_buckets.items():
+                for bound, count in zip(self.BUCKETS, buckets):
+                    lines.append(f'pipeline_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'pipeline_span_seconds_bucket{{span="{name}",le="+Inf"}} {self._span_count[name]}')
+                lines.append(f'pipeline_span_seconds_sum{{span="{name}"}} {self._span_sum[name]:.6f}')
+                lines.append(f'pipeline_span_seconds_count{{span="{name}"}} {self._span_count[name]}')
+            lines.append('# TYPE pipeline_span_errors_total counter')
+            for name, count in self._span_errors.items():
+                lines.append(f'pipeline_span_errors_total{{span="{name}"}} {count}')
+            typed = set()
+            for (key, model), value in sorted(self._llm_counters.items()):
+                # One counter family per key; sorting keeps each family's samples together
+                if key not in typed:
+                    lines.append(f'# TYPE llm_{key}_total counter')
+                    typed.add(key)
+                lines.append(f'llm_{key}_total{{model="{model}"}} {value:g}')
+        return lines
+
+class JsonlSpanExporter:
+    """Appends spans as OTLP-style JSON lines to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        record = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id,
+            'name': span.name,
+            'startTimeUnixNano': int(span.start_time * 1e9),
+            'endTimeUnixNano': int(span.end_time * 1e9),
+            'status': span.status,
+            'attributes': span.attributes,
+        }
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+
+class Tracer:
+    def __init__(self):
+        self.sinks = []
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+
+    def _export(self, finished: Span) -> None:
+        for sink in self.sinks:
+            try:
+                sink.export(finished)
+            except Exception as e:
+                logger.warning(f"Span export to {type(sink).__name__} failed: {str(e)}")
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        parent = _current_span.get()
+        current = Span(
+            name=name,
+            trace_id=trace_id or (parent.trace_id if parent else uuid.uuid4().hex),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.status = 'error'
+            current.set(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            current.end_time = time.time()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generators may be closed from a different context
+                pass
+            self._export(current)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+tracer = Tracer()
+metrics_sink = PrometheusSink()
+tracer.add_sink(metrics_sink)
+if os.getenv('TRACE_EXPORT_FILE'):
+    tracer.add_sink(JsonlSpanExporter(os.getenv('TRACE_EXPORT_FILE')))
+
+span = tracer.span
@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('app.user_cache')
+
+class UserCache:
+    """
+    Per-worker LRU of user documents keyed by username. Unknown usernames are cached as
+    None for a shorter negative TTL; writes to a user must call invalidate(), or
+    invalidate_user_id() where only the id is at hand.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30, negative_ttl: float = 5, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        # user_id -> username of the cached documents
+        self._usernames: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, username: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(found, document); found with a None document means the user is known not to exist."""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(username)
+            document = entry[0]
+            self.stats['hits' if document is not None else 'negative_hits'] += 1
+            return True, dict(document) if document is not None else None
+
+    def set(self, username: str, document: Optional[Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl if document is not None else self.negative_ttl
+        with self._lock:
+            self._entries[username] = (dict(document) if document is not None else None, time.monotonic() + ttl)
+            self._entries.move_to_end(username)
+            if document is not None and document.get('user_id'):
+                self._usernames[str(document['user_id'])] = username
+            while len(self._entries) > self.max_entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._forget_id(evicted)
+                self.stats['evictions'] += 1
+
+    def _forget_id(self, document: Optional[Dict[str, Any]]) -> None:
+        if document is not None and document.get('user_id'):
+            self._usernames.pop(str(document['user_id']), None)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(username, None)
+            if entry is not None:
+                self._forget_id(entry[0])
+                self.stats['invalidations'] += 1
+
+    def invalidate_user_id(self, user_id: str) -> None:
+        """Drop the cached document of a user known only by id, e.g. after a quota refund."""
+        with self._lock:
+            username = self._usernames.get(str(user_id))
+        if username is not None:
+            self.invalidate(username)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._usernames.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['negative_hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': (lookups - self.stats['misses']) / lookups if lookups else 0.0,
+            }
+
+def create_user_cache() -> UserCache:
+    """Build the cache from USER_CACHE_* environment variables."""
+    return UserCache(
+        max_entries=int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000')),
+        ttl=float(os.getenv('USER_CACHE_TTL', '30')),
+        negative_ttl=float(os.getenv('USER_CACHE_NEGATIVE_TTL', '5')),
+        enabled=os.getenv('USER_CACHE_ENABLED', 'true') == 'true',
+    )
+
+user_cache = create_user_cache()
@@ -0,0 +1,243 @@
+"""
+Offline throughput benchmark for page_builder_pipeline and the /page_builder SSE endpoint.
+
+LLM, Replicate and MongoDB are replaced by deterministic stubs, so runs cost nothing and
+results are comparable across commits:
+
+    python -m benchmarks.pipeline_bench --builds 8 --mode pipeline --output bench.json
+
+The endpoint mode drives POST /page_builder through httpx's ASGI transport and needs httpx installed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Must be set before the backend modules read them at import time
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+os.environ['LOCAL_DEV'] = 'true'
+os.environ['LLM_CACHE_ENABLED'] = os.environ.get('LLM_CACHE_ENABLED', 'false')
+os.environ.setdefault('IS_LOCAL_DEV', 'true')
+
+from benchmarks.stubs import InMemoryDatabase, StubLM, StubReplicate, unreachable_ssh_client
+
+SECTION_EVENTS = ('section_complete', 'section_delta')
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def install_stubs(args):
+    """Swap the real LM, Replicate and SSH backends for stubs."""
+    from backend.services.image_gen import image_gen_manager
+    from backend.services.page_builder import page_builder
+
+    stub_options = dict(
+        latency=args.llm_latency,
+        sections=args.sections,
+        images_per_section=args.images,
+        markup_bytes=args.markup_bytes,
+        css_bytes=args.css_bytes,
+    )
+    page_builder.lm = StubLM(model='stub/haiku', **stub_options)
+    page_builder.strong_lm = StubLM(model='stub/sonnet', **stub_options)
+    page_builder.image_generator.lm = StubLM(model='stub/categorizer', **stub_options)
+    image_gen_manager.replicate = StubReplicate(latency=args.image_latency, image_bytes=args.image_bytes)
+    # LOCAL_DEV still opens the SFTP mirror session; only the connection itself is stubbed
+    page_builder.ssh_manager.pool._connect = unreachable_ssh_client
+    # Section streaming calls litellm directly, which the stub LMs cannot serve
+    page_builder.STREAM_SECTION_MARKUP = False
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+async def run_pipeline_build(prompt, db, protocol_version):
+    from backend.services.page_builder.page_builder import page_builder_pipeline
+
+    start = time.perf_counter()
+    first_section = None
+    events = 0
+    event_bytes = 0
+    async for message in page_builder_pipeline(prompt, db, protocol_version=protocol_version):
+        events += 1
+        event_bytes += len(message)
+        payload = json.loads(message.removeprefix('data: '))
+        if payload['type'] in SECTION_EVENTS and first_section is None:
+            first_section = time.perf_counter() - start
+        if payload['type'] == 'error':
+            raise RuntimeError(payload['message'])
+    return {'ttfs': first_section, 'total': time.perf_counter() - start, 'events': events, 'bytes': event_bytes}
+
+async def run_endpoint_build(client, username, prompt, protocol_version):
+    from backend.middleware.Oauth2 import create_token_pair
+
+    token_pair = create_token_pair({'sub': username})
+    cookies = {'access_token': f'Bearer {token_pair.access_token}', 'refresh_token': token_pair.refresh_token}
+
+    start = time.perf_counter()
+    first_section = None
+    events = 0
+    event_bytes = 0
+    async with client.stream(
+        'POST',
+        '/page_builder',
+        json={'website_description': prompt, 'protocol_version': protocol_version},
+        cookies=cookies,
+        headers={'accept': 'text/event-stream'},
+    ) as response:
+        response.raise_for_status()
+        buffer = ''
+        async for chunk in response.aiter_text():
+            event_bytes += len(chunk)
+            buffer += chunk
+            *messages, buffer = buffer.split('\n\n')
+            for message in messages:
+                data = ''.join(line[6:] for line in message.split('\n') if line.startswith('data: '))
+                if not data:
+                    continue
+                events += 1
+                payload = json.loads(data)
+                if payload['type'] in SECTION_EVENTS and first_section is None:
+                    first_section = time.perf_counter() - start
+                if payload['type'] == 'error':
+                    raise RuntimeError(payload['message'])
+    return {'ttfs': first_section, 'total': time.perf_counter() - start, 'events': events, 'bytes': event_bytes}
+
+async def create_users(db, count):
+    from backend.middleware.Oauth2 import get_password_hash
+
+    hashed_password = await get_password_hash('benchmark')
+    usernames = []
+    for index in range(count):
+        username = f'bench_user_{index}'
+        await db.users.insert_one({
+            'username': username,
+            'hashed_password': hashed_password,
+            'disabled': False,
+            'api_request_count': 0,
+        })
+        usernames.append(username)
+    return usernames
+
+async def run_benchmark(args):
+    install_stubs(args)
+    db = InMemoryDatabase()
+    prompts = [f'{args.prompt} (variant {index})' for index in range(args.builds)]
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+
+    if args.mode == 'pipeline':
+        results = await asyncio.gather(*(run_pipeline_build(prompt, db, args.protocol) for prompt in prompts))
+    else:
+        import httpx
+        from backend.main import app
+
+        app.state.db = db
+        usernames = await create_users(db, args.builds)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+                results = await asyncio.gather(*(
+                    run_endpoint_build(client, username, prompt, args.protocol)
+                    for username, prompt in zip(usernames, prompts)
+                ))
+
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    ttfs = [result['ttfs'] for result in results if result['ttfs'] is not None]
+    totals = [result['total'] for result in results]
+    total_events = sum(result['events'] for result in results)
+    return {
+        'config': vars(args),
+        'builds': len(results),
+        'ttfs_p50': percentile(ttfs, 0.5),
+        'ttfs_p95': percentile(ttfs, 0.95),
+        'total_p50': percentile(totals, 0.5),
+        'total_p95': percentile(totals, 0.95),
+        'wall_time': elapsed,
+        'events_per_second': total_events / elapsed if elapsed else None,
+        'bytes_streamed': sum(result['bytes'] for result in results),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'loop_lag_p95_ms': (percentile(monitor.samples, 0.95) or 0) * 1000,
+        'loop_lag_max_ms': max(monitor.samples, default=0) * 1000,
+        'loop_lag_mean_ms': (statistics.mean(monitor.samples) if monitor.samples else 0) * 1000,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('pipeline', 'endpoint'), default='pipeline')
+    parser.add_argument('--builds', type=int, default=4, help='concurrent builds')
+    parser.add_argument('--protocol', type=int, default=2, help='SSE protocol version')
+    parser.add_argument('--prompt', default='Landing page for a coffee roastery')
+    parser.add_argument('--sections', type=int, default=4)
+    parser.add_argument('--images', type=int, default=2, help='images per section')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='seconds per stub LM call')
+    parser.add_argument('--image-latency', type=float, default=2.0, help='seconds per stub render')
+    parser.add_argument('--image-bytes', type=int, default=200_000)
+    parser.add_argument('--markup-bytes', type=int, default=4000)
+    parser.add_argument('--css-bytes', type=int, default=1500)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    project_root = os.getcwd()
+
+    # Generated images land under ./mnt; keep them out of the working tree
+    with tempfile.TemporaryDirectory(prefix='aitk-bench-') as workdir:
+        os.makedirs(os.path.join(project_root, 'mnt', 'media_storage', 'generated'), exist_ok=True)
+        sys.path.insert(0, project_root)
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run_benchmark(args))
+        finally:
+            os.chdir(project_root)
+
+    results['revision'] = git_revision()
+    print(json.dumps(results, indent=2, default=str))
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2, default=str)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""Deterministic stand-ins for dspy.LM, replicate and Motor used by the offline benchmarks."""
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+
+class StubLM:
+    """
+    Answers dspy ChatAdapter prompts with canned values for every output field the
+    signature asks for, after a fixed latency. Usage is recorded in history like dspy.LM.
+    """
+
+    def __init__(self, model='stub/lm', latency=0.5, sections=4, images_per_section=2, markup_bytes=4000, css_bytes=1500):
+        self.model = model
+        self.model_type = 'chat'
+        self.kwargs = {'temperature': 0.0, 'max_tokens': 4096}
+        self.history = []
+        self.latency = latency
+        self.sections = sections
+        self.images_per_section = images_per_section
+        self.markup_bytes = markup_bytes
+        self.css_bytes = css_bytes
+
+    def _output_fields(self, system_message: str) -> List[str]:
+        block = system_message.split('Your output fields are:', 1)[-1]
+        block = block.split('All interactions will be structured', 1)[0]
+        return re.findall(r'`(\w+)`', block)
+
+    def _filler(self, seed: str, size: int, template: str) -> str:
+        digest = hashlib.sha256(seed.encode('utf-8')).hexdigest()[:8]
+        unit = template.format(id=digest)
+        return (unit * (size // len(unit) + 1))[:size]
+
+    def _value(self, field: str, prompt: str) -> str:
+        if field == 'complexity_level':
+            return 'complex'
+        if field == 'reasoning':
+            return 'Stubbed reasoning.'
+        if field == 'sections':
+            return json.dumps([
+                {
+                    'section_name': f'Section {index}',
+                    'layout_structure': f'Row with heading, copy and {self.images_per_section} images',
+                    'image_requirements': f'{self.images_per_section} images for section {index}',
+                    'css_style_and_animation_instructions': 'Subtle fade in',
+                }
+                for index in range(1, self.sections + 1)
+            ])
+        if field == 'component_spec':
+            return json.dumps({
+                'component_name': 'Component',
+                'layout_structure': 'Card with heading and image',
+                'image_requirements': f'{self.images_per_section} images',
+                'css_style_and_animation_instructions': 'Subtle fade in',
+            })
+        if field == 'image_details':
+            return json.dumps([
+                {
+                    'image_name': f'image_{index}',
+                    'alt': f'Stub image {index}',
+                    'prompt': f'{prompt[-200:]} image {index}',
+                }
+                for index in range(self.images_per_section)
+            ])
+        if field in ('global_css', 'css_rules', 'transitions'):
+            return self._filler(prompt + field, self.css_bytes, '.stub-{id} {{ margin: 0; padding: 1rem; }}\n')
+        if field == 'markup':
+            return self._filler(prompt, self.markup_bytes, '<div class="card"><p>Stub {id} content</p></div>\n')
+        if field == 'category':
+            return 'benchmarks'
+        return f'stub {field}'
+
+    def __call__(self, prompt=None, messages=None, **kwargs):
+        messages = messages or [{'role': 'user', 'content': prompt or ''}]
+        system_message = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        user_message = messages[-1]['content']
+        time.sleep(self.latency)
+
+        fields = self._output_fields(system_message) or ['output']
+        completion = ''.join(
+            f"[[ ## {field} ## ]]\n{self._value(field, user_message)}\n\n" for field in fields
+        ) + '[[ ## completed ## ]]'
+
+        self.history.append({
+            'messages': messages,
+            'outputs': [completion],
+            'usage': {
+                'prompt_tokens': sum(len(m['content']) for m in messages) // 4,
+                'completion_tokens': len(completion) // 4,
+            },
+            'cost': 0.0,
+            'model': self.model,
+        })
+        return [completion]
+
+class StubFileOutput:
+    """Iterable of byte chunks, like replicate's FileOutput."""
+
+    def __init__(self, data: bytes, chunk_size: int = 65536):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for start in range(0, len(self.data), self.chunk_size):
+            yield self.data[start:start + self.chunk_size]
+
+    def read(self):
+        return self.data
+
+class StubReplicate:
+    def __init__(self, latency=2.0, image_bytes=200_000):
+        self.latency = latency
+        self.image_bytes = image_bytes
+
+    def run(self, model, input):
+        time.sleep(self.latency)
+        seed = hashlib.sha256(input['prompt'].encode('utf-8')).digest()
+        return [StubFileOutput((seed * (self.image_bytes // len(seed) + 1))[:self.image_bytes])]
+
+def unreachable_ssh_client():
+    """SSH connect stub: the dev media server is never reachable, so renders are only written locally."""
+    return None
+
+def _get_field(document: Dict[str, Any], key: str) -> Any:
+    value = document
+    for part in key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(_matches(document, sub_query) for sub_query in condition):
+                return False
+            continue
+        if key == '$and':
+            if not all(_matches(document, sub_query) for sub_query in condition):
+                return False
+            continue
+
+        value = _get_field(document, key)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            for op, operand in condition.items():
+                if op == '$exists':
+                    matched = (value is not None) == bool(operand)
+                elif op == '$in':
+                    matched = value in operand
+                elif op == '$nin':
+                    matched = value not in operand
+                elif op == '$ne':
+                    matched = value != operand
+                elif value is None:
+                    matched = False
+                elif op == '$gt':
+                    matched = value > operand
+                elif op == '$gte':
+                    matched = value >= operand
+                elif op == '$lt':
+                    matched = value < operand
+                elif op == '$lte':
+                    matched = value <= operand
+                else:
+                    raise NotImplementedError(f"Unsupported operator {op}")
+                if not matched:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    included = {key for key, flag in projection.items() if flag and key != '_id'}
+    if included:
+        projected = {key: document[key] for key in included if key in document}
+        if projection.get('_id', 1) and '_id' in document:
+            projected['_id'] = document['_id']
+        return projected
+    for key, flag in projection.items():
+        if not flag:
+            document.pop(key, None)
+    return document
+
+def _sort_documents(documents: List[Dict[str, Any]], sort) -> List[Dict[str, Any]]:
+    for key, direction in reversed(sort or []):
+        documents.sort(key=lambda doc: (_get_field(doc, key) is None, _get_field(doc, key)), reverse=direction < 0)
+    return documents
+
+def _apply_update(document: Dict[str, Any], update: Dict[str, Any], inserting: bool) -> None:
+    for op, fields in update.items():
+        if op == '$set' or (op == '$setOnInsert' and inserting):
+            document.update(copy.deepcopy(fields))
+        elif op == '$inc':
+            for key, amount in fields.items():
+                document[key] = document.get(key, 0) + amount
+        elif op == '$unset':
+            for key in fields:
+                document.pop(key, None)
+        elif op != '$setOnInsert':
+            raise NotImplementedError(f"Unsupported update operator {op}")
+
+class InMemoryCursor:
+    def __init__(self, documents: List[Dict[str, Any]], projection):
+        self._documents = documents
+        self._projection = projection
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = key if isinstance(key, list) else [(key, direction or 1)]
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def _results(self) -> List[Dict[str, Any]]:
+        documents = _sort_documents(list(self._documents), self._sort)
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(doc, self._projection) for doc in documents]
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        async def iterate():
+            for document in self._results():
+                yield document
+        return iterate()
+
+class InMemoryCollection:
+    """Subset of the Motor collection API used by the app, backed by a list."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.documents: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    async def create_index(self, keys, **kwargs):
+        await asyncio.sleep(0)
+        return keys if isinstance(keys, str) else '_'.join(f"{key}_{direction}" for key, direction in keys)
+
+    async def insert_one(self, document):
+        await asyncio.sleep(0)
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            self.documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document['_id'])
+
+    async def insert_many(self, documents):
+        ids = [(await self.insert_one(document)).inserted_id for document in documents]
+        return SimpleNamespace(inserted_ids=ids)
+
+    def _find(self, query):
+        with self._lock:
+            return [doc for doc in self.documents if _matches(doc, query or {})]
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        await asyncio.sleep(0)
+        documents = _sort_documents(self._find(query), sort)
+        return _project(documents[0], projection) if documents else None
+
+    def find(self, query=None, projection=None):
+        return InMemoryCursor(self._find(query), projection)
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        with self._lock:
+            for document in self.documents:
+                if _matches(document, query):
+                    _apply_update(document, update, inserting=False)
+                    return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+            if not upsert:
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+            document = {key: value for key, value in query.items() if not key.startswith('$') and not isinstance(value, dict)}
+            _apply_update(document, update, inserting=True)
+            document.setdefault('_id', ObjectId())
+            self.documents.append(document)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=document['_id'])
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False, return_document=False):
+        await asyncio.sleep(0)
+        with self._lock:
+            documents = _sort_documents([doc for doc in self.documents if _matches(doc, query)], sort)
+            if not documents:
+                return None
+            document = documents[0]
+            before = copy.deepcopy(document)
+            _apply_update(document, update, inserting=False)
+            return _project(document if return_document else before, projection)
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        with self._lock:
+            for index, document in enumerate(self.documents):
+                if _matches(document, query):
+                    del self.documents[index]
+                    return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query):
+        await asyncio.sleep(0)
+        with self._lock:
+            kept = [doc for doc in self.documents if not _matches(doc, query)]
+            deleted = len(self.documents) - len(kept)
+            self.documents = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def count_documents(self, query):
+        return len(self._find(query))
+
+    async def estimated_document_count(self):
+        return len(self.documents)
+
+class InMemoryDatabase:
+    def __init__(self):
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def get_collection(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get_collection(name)
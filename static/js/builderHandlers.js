@@ -46,8 +46,7 @@ function download(filename, text) {
 }
 
 function handleSaveHtml() {
-  const iframe = document.getElementById("preview");
-  const htmlContent = iframe.contentWindow.document.documentElement.outerHTML;
+  const htmlContent = pageBuilder.getDocumentHtml();
   download("website-description.html", htmlContent);
 }
 
@@ -62,9 +61,9 @@ async function handleSavePage() {
 
   try {
     const iframe = document.getElementById("preview");
-    const htmlContent = iframe.contentWindow.document.documentElement.outerHTML;
+    const htmlContent = pageBuilder.getDocumentHtml();
     const thumbnail = await createThumbnail(iframe, htmlContent, title);
-    document.getElementById("thumbnails-container").appendChild(thumbnail);
+    document.getElementById("thumbnails-container").prepend(thumbnail);
 
     saveThumbnail({
       id: thumbnail.id,
@@ -1,27 +1,140 @@
 import { showError } from "../utils/utils.js";
+
+// 2 = scaffold shell once, then per-section markup/CSS deltas
+const PROTOCOL_VERSION = 2;
+const MAX_RECONNECTS = 5;
+const IMAGE_PLACEHOLDER =
+  "data:image/svg+xml;charset=utf-8," +
+  encodeURIComponent(
+    '<svg xmlns="http://www.w3.org/2000/svg" width="16" height="9"><rect width="16" height="9" fill="#e9ecef"/></svg>'
+  );
+
 class PageBuilder {
   constructor() {
     this.pendingImageLoads = Promise.resolve();
+    this.finalDocument = null;
+    this.readyImages = new Map();
+    // Section index -> markup streamed so far, shown until the section's delta arrives
+    this.sectionDrafts = new Map();
+    this.jobId = null;
+    this.lastEventId = 0;
+    this.buildFinished = false;
     this.currentMessageGroup = null;
     this.iframe = document.getElementById("preview");
     this.streamContainer = document.getElementById("progress-stream");
   }
 
   updatePreviewIframe(htmlContent) {
+    // A full rewrite replaces whatever page_complete delivered
+    this.finalDocument = null;
     this.iframe.contentWindow.document.open();
     this.iframe.contentWindow.document.write(htmlContent);
     this.iframe.contentWindow.document.close();
   }
 
+  // Page to save: the server's final document when the build sent one, free of drafts and
+  // placeholders, otherwise the live preview
+  getDocumentHtml() {
+    return (
+      this.finalDocument ||
+      this.iframe.contentWindow.document.documentElement.outerHTML
+    );
+  }
+
+  // Append a section's markup and CSS to the scaffold already in the preview
+  applySectionDelta(markup, css, pendingImages = [], index = null) {
+    const previewDocument = this.iframe.contentWindow.document;
+    const root = previewDocument.getElementById("component-root");
+    const styleElement = previewDocument.getElementById("component-styles");
+
+    if (styleElement && css) {
+      styleElement.appendChild(previewDocument.createTextNode(`\n${css}`));
+    }
+    if (root && markup) {
+      // Finished sections go before the drafts of sections still streaming
+      const draft = root.querySelector(`[data-section-draft="${index}"]`);
+      const anchor = draft || root.querySelector("[data-section-draft]");
+      if (anchor) {
+        anchor.insertAdjacentHTML("beforebegin", markup);
+      } else {
+        root.insertAdjacentHTML("beforeend", markup);
+      }
+      if (draft) draft.remove();
+      this.sectionDrafts.delete(index);
+      this.markPendingImages(root, pendingImages);
+    }
+  }
+
+  // Render a section's markup while the model is still writing it
+  applySectionPartial(index, markup, reset, pendingImages = []) {
+    const draft = this.getSectionDraft(index);
+    if (!draft) return;
+    const html = (reset ? "" : this.sectionDrafts.get(index) || "") + markup;
+    this.sectionDrafts.set(index, html);
+    // The parser closes tags left open mid-stream; the next partial re-renders the whole draft
+    draft.innerHTML = html;
+    this.markPendingImages(draft, pendingImages);
+  }
+
+  // Draft container for a section, kept in section order after the finished sections
+  getSectionDraft(index) {
+    const previewDocument = this.iframe.contentWindow.document;
+    const root = previewDocument.getElementById("component-root");
+    if (!root) return null;
+    let draft = root.querySelector(`[data-section-draft="${index}"]`);
+    if (draft) return draft;
+
+    draft = previewDocument.createElement("div");
+    draft.dataset.sectionDraft = String(index);
+    const next = [...root.querySelectorAll("[data-section-draft]")].find(
+      (element) => Number(element.dataset.sectionDraft) > index
+    );
+    root.insertBefore(draft, next || null);
+    return draft;
+  }
+
+  // Show a placeholder for images whose render has not landed yet
+  markPendingImages(root, pendingImages) {
+    const pending = new Set(pendingImages);
+    root.querySelectorAll("img").forEach((img) => {
+      const path = img.getAttribute("src");
+      if (!pending.has(path)) return;
+      if (this.readyImages.has(path)) {
+        img.src = this.readyImages.get(path);
+        return;
+      }
+      img.dataset.pendingSrc = path;
+      img.src = IMAGE_PLACEHOLDER;
+    });
+  }
+
+  resolvePendingImage(path, url) {
+    this.readyImages.set(path, url);
+    const previewDocument = this.iframe.contentWindow.document;
+    previewDocument
+      .querySelectorAll(`img[data-pending-src="${CSS.escape(path)}"]`)
+      .forEach((img) => {
+        img.src = url;
+        img.removeAttribute("data-pending-src");
+      });
+  }
+
   async buildPage(description) {
     try {
       this.showProgressOverlay();
       const fetchOptions = {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ website_description: description }),
+        body: JSON.stringify({
+          website_description: description,
+          protocol_version: PROTOCOL_VERSION,
+        }),
       };
 
+      this.jobId = null;
+      this.lastEventId = 0;
+      this.buildFinished = false;
+
       const response = await fetch("/page_builder", fetchOptions);
       if (!response.ok) {
         const errorData = await response.json();
@@ -30,6 +143,7 @@ class PageBuilder {
       }
 
       await this.processStream(response.body.getReader());
+      await this.resumeStream();
     } catch (error) {
       console.error("Stream failed:", error);
       showError(error.message || "An error occurred while building the page");
@@ -39,24 +153,60 @@ class PageBuilder {
     }
   }
 
+  // Reconnect to the build job after a dropped connection, resuming from the last event
+  async resumeStream() {
+    let attempts = 0;
+    while (!this.buildFinished && this.jobId && attempts < MAX_RECONNECTS) {
+      attempts += 1;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * attempts));
+      const response = await fetch(`/page_builder/jobs/${this.jobId}/events`, {
+        headers: { "Last-Event-ID": String(this.lastEventId) },
+      });
+      if (!response.ok) continue;
+      await this.processStream(response.body.getReader());
+    }
+  }
+
   async processStream(reader) {
     const decoder = new TextDecoder();
+    let buffer = "";
 
     while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
+      let chunk;
+      try {
+        chunk = await reader.read();
+      } catch (error) {
+        console.warn("Stream interrupted:", error);
+        return;
+      }
+      if (chunk.done) break;
 
-      const messages = decoder.decode(value).split("\n\n");
+      buffer += decoder.decode(chunk.value, { stream: true });
+      const messages = buffer.split("\n\n");
+      buffer = messages.pop();
       for (const message of messages) {
-        if (!message.trim() || !message.startsWith("data: ")) continue;
-        await this.handleMessage(message);
+        await this.handleEvent(message);
       }
     }
   }
 
+  async handleEvent(message) {
+    let data = "";
+    for (const line of message.split("\n")) {
+      if (line.startsWith("id: ")) {
+        this.lastEventId = Number(line.slice(4));
+      } else if (line.startsWith("data: ")) {
+        data += line.slice(6);
+      }
+    }
+    if (data) {
+      await this.handleMessage(data);
+    }
+  }
+
   async handleMessage(message) {
     try {
-      const jsonData = JSON.parse(message.replace("data: ", ""));
+      const jsonData = JSON.parse(message);
       this.startNewMessageGroup();
       await this.processMessageType(jsonData);
     } catch (error) {
@@ -67,7 +217,16 @@ class PageBuilder {
 
   async processMessageType(jsonData) {
     switch (jsonData.type) {
+      case "job":
+        this.jobId = jsonData.job_id;
+        break;
+
+      case "pipeline_complete":
+        this.buildFinished = true;
+        break;
+
       case "error":
+        this.buildFinished = true;
         showError(jsonData.message);
         throw new Error(jsonData.message);
 
@@ -93,6 +252,40 @@ class PageBuilder {
         }
         break;
 
+      case "scaffold":
+        this.readyImages.clear();
+        this.sectionDrafts.clear();
+        this.updatePreviewIframe(jsonData.content);
+        break;
+
+      case "section_delta":
+        await this.pendingImageLoads;
+        this.applySectionDelta(
+          jsonData.markup,
+          jsonData.css,
+          jsonData.pending_images,
+          jsonData.index
+        );
+        break;
+
+      case "section_partial":
+        this.applySectionPartial(
+          jsonData.index,
+          jsonData.markup,
+          jsonData.reset,
+          jsonData.pending_images
+        );
+        break;
+
+      case "image_ready":
+        this.resolvePendingImage(jsonData.path, jsonData.url);
+        break;
+
+      case "page_complete":
+        // The preview is already up to date; getDocumentHtml saves this document
+        this.finalDocument = jsonData.content;
+        break;
+
       case "image":
         await this.addProgressItem("image", jsonData.description, jsonData.url);
         break;
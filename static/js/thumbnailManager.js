@@ -22,16 +22,40 @@ export async function deleteThumbnail(thumbnailId) {
     });
 }
 
-async function getSavedThumbnails() {
-    const response = await fetch('/thumbnails');
-    const data = await response.json();
-    return data;
+const THUMBNAIL_PAGE_SIZE = 20;
+
+async function getSavedThumbnails(cursor = null) {
+    const params = new URLSearchParams({ limit: THUMBNAIL_PAGE_SIZE });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`/thumbnails?${params}`);
+    return response.json();
 }
 
-export async function createThumbnail(iframe, htmlContent, title) {
-    const thumbnailId = Array.from({ length: 24 }, () =>
-        Math.floor(Math.random() * 16).toString(16)
-    ).join('');
+// HTML bodies are fetched on demand; the browser revalidates them with the ETag
+const thumbnailHtmlCache = new Map();
+
+export function getThumbnailHtml(thumbnailId) {
+    if (!thumbnailHtmlCache.has(thumbnailId)) {
+        const request = fetch(`/thumbnails/${thumbnailId}/html`).then((response) => {
+            if (!response.ok) {
+                thumbnailHtmlCache.delete(thumbnailId);
+                throw new Error(`Failed to load page ${thumbnailId}`);
+            }
+            return response.text();
+        });
+        thumbnailHtmlCache.set(thumbnailId, request);
+    }
+    return thumbnailHtmlCache.get(thumbnailId);
+}
+
+function showInPreview(htmlContent) {
+    const mainIframe = document.getElementById('preview');
+    mainIframe.contentWindow.document.open();
+    mainIframe.contentWindow.document.write(htmlContent);
+    mainIframe.contentWindow.document.close();
+}
+
+function createThumbnailWrapper(thumbnailId, title, loadHtml) {
     // Clone the template
     const template = document.getElementById('thumbnail-template');
     const thumbnailWrapper = template.content
@@ -56,6 +80,7 @@ export async function createThumbnail(iframe, htmlContent, title) {
         e.stopPropagation();
         if (confirm('Are you sure you want to delete this thumbnail?')) {
             thumbnailWrapper.remove();
+            thumbnailHtmlCache.delete(thumbnailId);
             deleteThumbnail(thumbnailId);
         }
     };
@@ -66,18 +91,14 @@ export async function createThumbnail(iframe, htmlContent, title) {
     // Set up click handler
     thumbnailWrapper
         .querySelector('.thumbnail')
-        .addEventListener('click', () => {
-            const mainIframe = document.getElementById('preview');
-            mainIframe.contentWindow.document.open();
-            mainIframe.contentWindow.document.write(htmlContent);
-            mainIframe.contentWindow.document.close();
+        .addEventListener('click', async () => {
+            showInPreview(await loadHtml());
         });
 
-    // Add to DOM
-    document
-        .getElementById('thumbnails-container')
-        .appendChild(thumbnailWrapper);
+    return thumbnailWrapper;
+}
 
+async function captureThumbnailImage(iframe, thumbnailImg) {
     // Capture thumbnail image from iframe
     const iframeDocument = iframe.contentWindow.document;
     iframe.style.width = '1920px';
@@ -109,30 +130,93 @@ export async function createThumbnail(iframe, htmlContent, title) {
         allowTaint: true, // Allow cross-origin images to taint canvas
     });
     thumbnailImg.src = canvas.toDataURL();
-
-    return thumbnailWrapper;
 }
 
-export async function loadSavedThumbnails() {
-    const savedThumbnails = await getSavedThumbnails();
-    const container = document.getElementById('thumbnails-container');
+export async function createThumbnail(iframe, htmlContent, title) {
+    const thumbnailId = Array.from({ length: 24 }, () =>
+        Math.floor(Math.random() * 16).toString(16)
+    ).join('');
+    thumbnailHtmlCache.set(thumbnailId, Promise.resolve(htmlContent));
+    const thumbnailWrapper = createThumbnailWrapper(thumbnailId, title, () =>
+        getThumbnailHtml(thumbnailId)
+    );
+
+    // Newest first, ahead of the pagination sentinel
+    document
+        .getElementById('thumbnails-container')
+        .prepend(thumbnailWrapper);
 
-    for (const thumbnailData of savedThumbnails) {
-        // Create a temporary iframe to generate the thumbnail
-        const iframe = document.createElement('iframe');
-        document.body.appendChild(iframe);
-        iframe.contentWindow.document.open();
-        iframe.contentWindow.document.write(thumbnailData.html);
-        const thumbnail = await createThumbnail(
-            iframe,
-            thumbnailData.html,
-            thumbnailData.title,
-            thumbnailData._id
-        );
+    await captureThumbnailImage(iframe, thumbnailWrapper.querySelector('.thumbnail-img'));
 
+    return thumbnailWrapper;
+}
+
+async function renderSavedThumbnail(thumbnailWrapper) {
+    const htmlContent = await getThumbnailHtml(thumbnailWrapper.id);
+    // Render in a temporary iframe to generate the thumbnail
+    const iframe = document.createElement('iframe');
+    document.body.appendChild(iframe);
+    iframe.contentWindow.document.open();
+    iframe.contentWindow.document.write(htmlContent);
+    try {
+        await captureThumbnailImage(iframe, thumbnailWrapper.querySelector('.thumbnail-img'));
+    } finally {
         iframe.contentWindow.document.close();
-        thumbnail.id = thumbnailData.id;
-        container.appendChild(thumbnail);
         document.body.removeChild(iframe);
     }
 }
+
+// Thumbnails are rendered one at a time, and only once they scroll into view
+let renderQueue = Promise.resolve();
+const thumbnailObserver = new IntersectionObserver((entries) => {
+    for (const entry of entries) {
+        if (!entry.isIntersecting) continue;
+        thumbnailObserver.unobserve(entry.target);
+        renderQueue = renderQueue
+            .then(() => renderSavedThumbnail(entry.target))
+            .catch((error) => console.error(error));
+    }
+});
+
+export async function loadSavedThumbnails() {
+    const container = document.getElementById('thumbnails-container');
+    const sentinel = document.createElement('div');
+    sentinel.className = 'thumbnails-sentinel';
+    container.appendChild(sentinel);
+
+    let cursor = null;
+    const loadPage = async () => {
+        const page = await getSavedThumbnails(cursor);
+        for (const thumbnailData of page.items) {
+            const thumbnail = createThumbnailWrapper(
+                thumbnailData._id,
+                thumbnailData.title,
+                () => getThumbnailHtml(thumbnailData._id)
+            );
+            container.insertBefore(thumbnail, sentinel);
+            thumbnailObserver.observe(thumbnail);
+        }
+        cursor = page.next_cursor;
+        return Boolean(cursor);
+    };
+
+    // Fetch further pages when the end of the list becomes visible
+    let loading = false;
+    const pageObserver = new IntersectionObserver(async (entries) => {
+        if (loading || !entries.some((entry) => entry.isIntersecting)) return;
+        loading = true;
+        try {
+            if (!(await loadPage())) {
+                pageObserver.disconnect();
+                sentinel.remove();
+                return;
+            }
+        } finally {
+            loading = false;
+        }
+        // Re-observing reports the sentinel again if the new page did not push it out of view
+        pageObserver.unobserve(sentinel);
+        pageObserver.observe(sentinel);
+    });
+    pageObserver.observe(sentinel);
+}